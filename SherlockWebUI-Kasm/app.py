@@ -1,6 +1,21 @@
 import streamlit as st
+import os
+import http.server
+import importlib.util
+import json
+import queue
+import sqlite3
 import subprocess
 import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# Fast start: pandas is imported by the functions that render tables, so the
+# first page render does not wait for it. Each page setup is timed (see below).
+script_started = time.perf_counter()
 
 # Page setup
 st.set_page_config(page_title="Sherlock WebUI", layout="wide")
@@ -60,8 +75,19 @@ if theme == "Dark":
         unsafe_allow_html=True
     )
 
-# Input
+# Input: one username, or with batch mode a pasted or uploaded list of them
 username = st.text_input("Username to search:")
+batch = st.checkbox("Batch mode (many usernames)")
+batch_usernames = []
+if batch:
+    pasted = st.text_area("Usernames (one per line):", "", key="batch_pasted")
+    uploaded = st.file_uploader("...or upload a list of usernames:", type=["txt", "csv"], key="batch_file")
+    lines = pasted.splitlines()
+    if uploaded is not None:
+        lines += uploaded.getvalue().decode("utf-8", errors="replace").splitlines()
+    names = [line.strip().split(",")[0].strip() for line in lines]
+    batch_usernames = list(dict.fromkeys(n for n in names if n and not n.startswith("#")))
+    st.caption(f"{len(batch_usernames)} usernames in the batch.")
 
 # Sidebar options
 st.sidebar.header("Options")
@@ -72,57 +98,722 @@ xlsx_out = st.sidebar.checkbox("XLSX output (--xlsx)")
 browse = st.sidebar.checkbox("Browse (--browse)")
 no_color = st.sidebar.checkbox("No color (--no-color)")
 nsfw = st.sidebar.checkbox("Include NSFW (--nsfw)")
-loose = st.sidebar.checkbox("Loose search (wildcard . _ -)")
+print_all = st.sidebar.checkbox("Report not-found sites (--print-all)")
+loose = st.sidebar.checkbox("Loose search (try . _ - and no separator variants)")
 timeout = st.sidebar.number_input("Timeout (sec)", value=60, min_value=1)
 proxy = st.sidebar.text_input("Proxy URL (e.g. socks5://)")
 sites = st.sidebar.text_input("Sites (comma-separated)")
 
-# Run Sherlock and stream output
+# Instrumentation: per-stage timers (process spawn, time to first hit, whole
+# search) and counters are aggregated for the app in the sidebar panel,
+# written per search as a JSONL trace next to its output file, and, when
+# SHERLOCK_METRICS_PORT is set, served in Prometheus text format on localhost.
+METRICS_SAMPLES = 2048
+METRICS_PORT = int(os.environ.get("SHERLOCK_METRICS_PORT") or 0)
+TRACE_SUFFIX = ".trace.jsonl"
+TRACE_FLUSH_EVENTS = 1000
+
+class StageMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.counters = {}
+            self.started = time.time()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = {
+                    "count": 0, "total": 0.0, "max": 0.0, "samples": deque(maxlen=METRICS_SAMPLES)
+                }
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            entry["samples"].append(seconds)
+
+    def incr(self, counter, n=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def summary(self):
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            stages = {}
+            for stage, entry in self.stages.items():
+                samples = sorted(entry["samples"])
+                stages[stage] = {
+                    "count": entry["count"], "total_s": round(entry["total"], 3),
+                    "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+                    "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+                    "max_ms": round(entry["max"] * 1000, 2)
+                }
+            counters = {name: {"total": value, "per_sec": round(value / elapsed, 2)}
+                        for name, value in self.counters.items()}
+        return {"elapsed_s": round(elapsed, 1), "stages": stages, "counters": counters}
+
+    def prometheus(self, prefix):
+        summary = self.summary()
+        lines = [f"# TYPE {prefix}_stage_seconds summary"]
+        for stage, stats in summary["stages"].items():
+            for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+                lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {stats[key] / 1000}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["total_s"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        for name, stats in summary["counters"].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {stats['total']}")
+        return "\n".join(lines) + "\n"
+
+class ScanTrace:
+    def __init__(self, path):
+        self.path = path
+        self.metrics = StageMetrics()
+        self.lock = threading.Lock()
+        self.events = []
+        self.started = time.monotonic()
+
+    def record(self, stage, seconds, fields):
+        self.metrics.observe(stage, seconds)
+        event = {"t": round(time.monotonic() - self.started - seconds, 4), "stage": stage,
+                 "ms": round(seconds * 1000, 3), **fields}
+        with self.lock:
+            self.events.append(event)
+            if len(self.events) >= TRACE_FLUSH_EVENTS:
+                self._flush()
+
+    def _flush(self):
+        if self.events:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write("".join(json.dumps(event) + "\n" for event in self.events))
+            self.events = []
+
+    def close(self):
+        with self.lock:
+            self.events.append({"summary": self.metrics.summary()})
+            self._flush()
+
+class Instrumentation:
+    def __init__(self):
+        self.totals = StageMetrics()
+        self.startup = {}
+
+    def observe(self, stage, seconds, trace=None, **fields):
+        self.totals.observe(stage, seconds)
+        if trace is not None:
+            trace.record(stage, seconds, fields)
+
+    @contextmanager
+    def timer(self, stage, trace=None, **fields):
+        started = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.observe(stage, time.perf_counter() - started, trace, **fields)
+
+    def incr(self, counter, n=1, trace=None):
+        self.totals.incr(counter, n)
+        if trace is not None:
+            trace.metrics.incr(counter, n)
+
+@st.cache_resource
+def get_instrumentation():
+    return Instrumentation()
+
+metrics = get_instrumentation()
+
+@st.cache_resource
+def start_metrics_server(port, _metrics):
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = _metrics.totals.prometheus("sherlock_webui").encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if METRICS_PORT:
+    start_metrics_server(METRICS_PORT, metrics)
+
+metrics_expander = st.sidebar.expander("📈 Search metrics")
+if metrics_expander.button("Reset metrics"):
+    metrics.totals.reset()
+metrics_panel = metrics_expander.empty()
+
+def render_metrics():
+    summary = metrics.totals.summary()
+    with metrics_panel.container():
+        if not summary["stages"]:
+            st.caption("No searches recorded yet.")
+        else:
+            import pandas as pd
+            st.dataframe(pd.DataFrame([
+                {"Stage": stage, "Count": stats["count"], "Total (s)": stats["total_s"],
+                 "p50 (ms)": stats["p50_ms"], "p95 (ms)": stats["p95_ms"]}
+                for stage, stats in summary["stages"].items()
+            ]), hide_index=True)
+            st.dataframe(pd.DataFrame([
+                {"Counter": name, "Total": stats["total"], "Per sec": stats["per_sec"]}
+                for name, stats in summary["counters"].items()
+            ]), hide_index=True)
+        st.caption(f"Since {datetime.fromtimestamp(metrics.totals.started):%H:%M:%S}; "
+                   f"per-search traces are saved as *{TRACE_SUFFIX} next to each output file.")
+        if METRICS_PORT:
+            st.caption(f"Prometheus metrics: http://127.0.0.1:{METRICS_PORT}/metrics")
+        if metrics.startup:
+            st.caption(f"Page setup: {metrics.startup['page_setup'] * 1000:.0f} ms "
+                       f"(first run of this server: {metrics.startup['first_page_setup'] * 1000:.0f} ms)")
+
+# Generic process runner: stdout and stderr are drained on background threads
+# so a chatty child can never block on a full pipe, stdout lines are handed to
+# on_line as they arrive, and an optional wall-clock limit or cancel event
+# stops the child early. A Streamlit Stop/rerun raises inside the callbacks,
+# and the finally block makes sure the child does not outlive the script run.
+def run_process(cmd, on_line, timeout=None, cancel_event=None, on_progress=None,
+                progress_interval=1.0, merge_stderr=False, stderr_lines=50, trace=None, env=None):
+    with metrics.timer("process_spawn", trace, command=os.path.basename(cmd[0])):
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+            env=env
+        )
+    metrics.incr("process_spawns", trace=trace)
+    line_queue = queue.Queue()
+    stderr_tail = deque(maxlen=stderr_lines)
+    stats = {"lines": 0, "bytes": 0, "elapsed": 0.0, "timed_out": False, "cancelled": False}
+
+    def drain(stream, name):
+        for raw in iter(stream.readline, b""):
+            line_queue.put((name, raw))
+        stream.close()
+        line_queue.put((name, None))
+
+    streams = [(proc.stdout, "stdout")]
+    if not merge_stderr:
+        streams.append((proc.stderr, "stderr"))
+    for stream, name in streams:
+        threading.Thread(target=drain, args=(stream, name), daemon=True).start()
+
+    def update_stats():
+        stats["elapsed"] = time.monotonic() - start
+        elapsed = max(stats["elapsed"], 1e-6)
+        stats["lines_per_sec"] = stats["lines"] / elapsed
+        stats["bytes_per_sec"] = stats["bytes"] / elapsed
+
+    start = last_progress = time.monotonic()
+    open_streams = len(streams)
+    finished = False
+    try:
+        while open_streams:
+            now = time.monotonic()
+            if timeout and now - start > timeout:
+                stats["timed_out"] = True
+                break
+            if cancel_event is not None and cancel_event.is_set():
+                stats["cancelled"] = True
+                break
+            if on_progress and now - last_progress >= progress_interval:
+                last_progress = now
+                update_stats()
+                on_progress(stats)
+            try:
+                name, raw = line_queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if raw is None:
+                open_streams -= 1
+                continue
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            if name == "stderr":
+                stderr_tail.append(line)
+                continue
+            stats["lines"] += 1
+            stats["bytes"] += len(raw)
+            on_line(line)
+        finished = not (stats["timed_out"] or stats["cancelled"])
+    finally:
+        if not finished and proc.poll() is None:
+            proc.kill()
+        proc.wait()
+    update_stats()
+    stats["returncode"] = proc.returncode
+    stats["stderr"] = "\n".join(stderr_tail)
+    return stats
+
+def format_progress(stats):
+    return (
+        f"{stats['lines']} lines · {stats['bytes'] / 1e6:.1f} MB read · "
+        f"{stats['lines_per_sec']:.0f} lines/s · {stats['bytes_per_sec'] / 1e6:.2f} MB/s · "
+        f"{stats['elapsed']:.0f}s elapsed"
+    )
+
+# Structured output: Sherlock reports each site as "[+] Site: URL" (found) or
+# "[-] Site: reason" (not found, illegal username or error), after a
+# "[*] Checking username NAME on:" header per username. Colour codes are
+# stripped before parsing; the raw transcript still goes to the output file.
+ANSI_RE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+CHECKING_RE = re.compile(r"^\[\*\] Checking username (.+?) on:")
+SITE_RE = re.compile(r"^\[([+-])\] ([^:]+): (.*)$")
+HIT_COLUMNS = ["Username", "Site", "URL", "Checked"]
+
+def parse_sherlock_line(line):
+    match = CHECKING_RE.match(line)
+    if match:
+        return "username", match.group(1), None
+    match = SITE_RE.match(line)
+    if not match:
+        return None
+    site, detail = match.group(2).strip(), match.group(3).strip()
+    if match.group(1) == "+":
+        return "found", site, detail
+    if detail.rstrip("!") == "Not Found":
+        return "not_found", site, detail
+    return "error", site, detail
+
+# Loose search: a username with separators is searched as each of its
+# variants (john.doe -> johndoe, john.doe, john_doe, john-doe), one search each.
+LOOSE_SEPARATORS = ("", ".", "_", "-")
+
+def loose_variants(name):
+    parts = [part for part in re.split(r"[._-]+", name) if part]
+    if len(parts) < 2:
+        return [name]
+    return list(dict.fromkeys([name] + [sep.join(parts) for sep in LOOSE_SEPARATORS]))
+
+# Result cache: found / not-found results per (username, site) are kept in
+# SQLite. Within the TTL, sites already checked for a username are left out of
+# the next search for it and their cached results are shown instead; errors
+# are never cached, so those sites are retried.
+STATE_DIR = os.environ.get("SHERLOCK_STATE_DIR", "/home/kasm-user/.cache/sherlock-webui")
+RESULT_CACHE_PATH = os.path.join(STATE_DIR, "results.db")
+CACHED_STATUSES = ("found", "not_found")
+
+class ResultCache:
+    def __init__(self, path=RESULT_CACHE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "username TEXT NOT NULL, site TEXT NOT NULL COLLATE NOCASE, status TEXT NOT NULL, "
+            "url TEXT, checked REAL NOT NULL, PRIMARY KEY (username, site))"
+        )
+        self.conn.commit()
+
+    def fresh(self, username, ttl):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT site, status, url, checked FROM results WHERE username = ? AND checked >= ?",
+                (username, time.time() - ttl)
+            ).fetchall()
+        return {site.lower(): {"site": site, "status": status, "url": url, "checked": checked}
+                for site, status, url, checked in rows}
+
+    def put(self, username, site, status, url):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (username, site, status, url, checked) VALUES (?, ?, ?, ?, ?)",
+                (username, site, status, url, time.time())
+            )
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+
+    def size(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM results")
+            self.conn.commit()
+
+@st.cache_resource
+def get_result_cache():
+    return ResultCache()
+
+result_cache = get_result_cache()
+
+# Site names from the data.json bundled with the sherlock package, used to work
+# out which sites still need checking; None if the package data is unavailable.
+@st.cache_data
+def local_site_names(include_nsfw):
+    spec = importlib.util.find_spec("sherlock_project")
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    try:
+        with open(os.path.join(spec.submodule_search_locations[0], "resources", "data.json")) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return [
+        name for name, info in data.items()
+        if not name.startswith("$") and isinstance(info, dict) and (include_nsfw or not info.get("isNSFW"))
+    ]
+
+# Rendering budget for the selected search: new hits are appended to its
+# results table in batches, at most every RENDER_INTERVAL seconds unless
+# RENDER_BATCH_ROWS hits are waiting; only the transcript tail is kept in memory.
+RENDER_INTERVAL = 1.0
+RENDER_BATCH_ROWS = 25
+RENDER_POLL = 0.1
+TRANSCRIPT_TAIL_LINES = 200
+
+# Run limits: a wall-clock cap per search, and how many searches may run at once
+run_timeout_min = st.sidebar.number_input("Search time limit (minutes, 0 = none)", value=0, min_value=0)
+max_jobs = st.sidebar.number_input("Concurrent searches", value=2, min_value=1, max_value=8)
+cache_ttl_hours = st.sidebar.number_input(
+    "Reuse results checked within (hours, 0 = off)", value=24, min_value=0,
+    help="Not used when CSV or XLSX output is selected, so the exports cover every site."
+)
+if cache_ttl_hours and not (csv_out or xlsx_out):
+    st.sidebar.caption("While results are reused, --print-all is always passed so not-found sites "
+                       "can be cached too; they appear in the transcript.")
+if st.sidebar.button(f"Clear result cache ({result_cache.size()} results)", key="clear_result_cache"):
+    result_cache.clear()
+
+# Background search jobs: each search runs as a sherlock child process managed
+# by a scheduler kept in Streamlit's resource cache, so searches survive
+# reruns and several can run side by side up to the configured limit. Each
+# job writes its transcript to its own file in Downloads; the page polls job
+# state while any search is active.
+JOB_ACTIVE_STATES = ("queued", "running")
+
+class JobScheduler:
+    def __init__(self, max_running=2):
+        self.lock = threading.Lock()
+        self.max_running = max_running
+        self.jobs = {}
+        self.queue = deque()
+        self.counter = 0
+
+    def set_limit(self, max_running):
+        with self.lock:
+            self.max_running = max_running
+        self._dispatch()
+
+    def submit(self, label, cmd, output_path, timeout=None, cached=()):
+        with self.lock:
+            self.counter += 1
+            job = {
+                "id": self.counter, "label": label, "cmd": cmd, "output_path": output_path,
+                "timeout": timeout, "state": "queued", "returncode": None,
+                "submitted": time.time(), "started": None, "finished": None,
+                "lines": deque(maxlen=TRANSCRIPT_TAIL_LINES), "line_count": 0, "hits": [],
+                "counts": {"found": 0, "not_found": 0, "error": 0, "cached": len(cached)},
+                "cached": list(cached), "progress": "", "error": "", "cancel": threading.Event()
+            }
+            for entry in job["cached"]:
+                job["counts"][entry["status"]] += 1
+                if entry["status"] == "found":
+                    job["hits"].append({
+                        "Username": label, "Site": entry["site"], "URL": entry["url"],
+                        "Checked": f"{datetime.fromtimestamp(entry['checked']):%Y-%m-%d %H:%M} (cached)"
+                    })
+            self.jobs[job["id"]] = job
+            self.queue.append(job)
+        self._dispatch()
+        return job["id"]
+
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["state"] not in JOB_ACTIVE_STATES:
+                return
+            job["cancel"].set()
+            if job["state"] == "queued":
+                self.queue.remove(job)
+                job["state"] = "cancelled"
+                job["finished"] = time.time()
+
+    def active(self):
+        with self.lock:
+            return any(job["state"] in JOB_ACTIVE_STATES for job in self.jobs.values())
+
+    def snapshot(self):
+        with self.lock:
+            return [
+                dict({k: v for k, v in job.items() if k not in ("cmd", "cancel", "hits", "cached")},
+                     lines=list(job["lines"]), counts=dict(job["counts"]))
+                for job in sorted(self.jobs.values(), key=lambda j: j["id"], reverse=True)
+            ]
+
+    def hits(self, job_id, start=0):
+        with self.lock:
+            return self.jobs[job_id]["hits"][start:]
+
+    def _dispatch(self):
+        with self.lock:
+            running = sum(1 for job in self.jobs.values() if job["state"] == "running")
+            while self.queue and running < self.max_running:
+                job = self.queue.popleft()
+                job["state"] = "running"
+                job["started"] = time.time()
+                running += 1
+                threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        try:
+            self._execute(job)
+        except Exception as e:
+            job["state"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["finished"] = time.time()
+            self._dispatch()
+
+    def _execute(self, job):
+        os.makedirs(os.path.dirname(job["output_path"]), exist_ok=True)
+        trace = ScanTrace(job["output_path"] + TRACE_SUFFIX)
+        started = time.perf_counter()
+        first_hit = None
+        current_user = job["label"]
+        metrics.incr("searches", trace=trace)
+        try:
+            with open(job["output_path"], "a") as out_f, metrics.timer("search", trace, username=job["label"]):
+                if job["cached"]:
+                    out_f.write(f"[*] Reusing {len(job['cached'])} cached results for {job['label']}\n")
+                    out_f.writelines(
+                        f"[+] {entry['site']}: {entry['url']} (cached {datetime.fromtimestamp(entry['checked']):%Y-%m-%d %H:%M})\n"
+                        for entry in job["cached"] if entry["status"] == "found"
+                    )
+                if not job["cmd"]:
+                    job["progress"] = f"all {len(job['cached'])} sites reused from cache"
+                    job["returncode"] = 0
+                    job["state"] = "done"
+                    return
+
+                def on_line(ln):
+                    nonlocal first_hit, current_user
+                    out_f.write(ln + "\n")
+                    out_f.flush()
+                    text = ANSI_RE.sub("", ln).rstrip()
+                    parsed = parse_sherlock_line(text)
+                    with self.lock:
+                        job["lines"].append(text)
+                        job["line_count"] += 1
+                        if parsed and parsed[0] == "username":
+                            current_user = parsed[1]
+                        elif parsed:
+                            job["counts"][parsed[0]] += 1
+                            if parsed[0] == "found":
+                                job["hits"].append({
+                                    "Username": current_user, "Site": parsed[1], "URL": parsed[2],
+                                    "Checked": f"{datetime.now():%Y-%m-%d %H:%M}"
+                                })
+                    if parsed and parsed[0] in CACHED_STATUSES:
+                        result_cache.put(current_user, parsed[1], parsed[0], parsed[2] if parsed[0] == "found" else None)
+                    metrics.incr("lines", trace=trace)
+                    if parsed and parsed[0] == "found":
+                        metrics.incr("sites_found", trace=trace)
+                        if first_hit is None:
+                            first_hit = time.perf_counter() - started
+                            metrics.observe("first_hit", first_hit, trace)
+
+                # Sherlock prints with Python's default block buffering on a
+                # pipe; unbuffered output lets hits reach the table as found
+                result = run_process(
+                    job["cmd"], on_line, timeout=job["timeout"], cancel_event=job["cancel"], merge_stderr=True,
+                    on_progress=lambda stats: job.update(progress=format_progress(stats)), trace=trace,
+                    env=dict(os.environ, PYTHONUNBUFFERED="1")
+                )
+        finally:
+            result_cache.commit()
+            trace.close()
+        job["progress"] = format_progress(result)
+        job["returncode"] = result["returncode"]
+        if result["cancelled"]:
+            job["state"] = "cancelled"
+        elif result["timed_out"]:
+            job["state"] = "timed out"
+        elif result["returncode"] != 0:
+            job["state"] = "failed"
+        else:
+            job["state"] = "done"
+
+@st.cache_resource
+def get_job_scheduler():
+    return JobScheduler()
+
+job_scheduler = get_job_scheduler()
+job_scheduler.set_limit(max_jobs)
+
+def render_counts(area, job):
+    with area.container():
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Found", job["counts"]["found"])
+        c2.metric("Not found", job["counts"]["not_found"])
+        c3.metric("Errors", job["counts"]["error"])
+        c4.metric("From cache", job["counts"]["cached"])
+
+def hits_frame(hits, start=0):
+    import pandas as pd
+    return pd.DataFrame(hits, columns=HIT_COLUMNS, index=range(start, start + len(hits)))
+
+def render_jobs(area, jobs):
+    import pandas as pd
+    now = time.time()
+    area.dataframe(pd.DataFrame([{
+        "Search": job["id"],
+        "Username": job["label"],
+        "State": job["state"],
+        "Found": job["counts"]["found"],
+        "Lines": job["line_count"],
+        "Elapsed": f"{((job['finished'] or now) - job['started']):.0f}s" if job["started"] else "",
+        "Progress": job["error"] or job["progress"],
+        "Output": os.path.basename(job["output_path"])
+    } for job in jobs]), use_container_width=True, hide_index=True)
+
+# Startup timing: every script run's page setup is shown in the metrics panel.
+# The first run in a server process is also appended to STARTUP_LOG, where the
+# startup script records how long the server took to report ready.
+STARTUP_LOG = os.path.join(STATE_DIR, "startup.jsonl")
+
+def log_startup(event, seconds):
+    os.makedirs(os.path.dirname(STARTUP_LOG), exist_ok=True)
+    with open(STARTUP_LOG, "a") as f:
+        f.write(json.dumps({"time": datetime.now().isoformat(timespec="seconds"), "event": event,
+                            "seconds": round(seconds, 3)}) + "\n")
+
+metrics.startup["page_setup"] = time.perf_counter() - script_started
+if "first_page_setup" not in metrics.startup:
+    metrics.startup["first_page_setup"] = metrics.startup["page_setup"]
+    log_startup("first_page_setup", metrics.startup["page_setup"])
+
+# Queue Sherlock searches: one job per username (and per loose variant), run
+# through the scheduler's bounded pool with shared proxy, Tor and timeout
+# settings. With the result cache on, --print-all is added so not-found
+# results can be cached, and sites with a fresh cached result are skipped.
+def submit_search(name, base_cmd, site_filter, ttl):
+    cmd = list(base_cmd)
+    candidates = site_filter or local_site_names(nsfw)
+    cached = result_cache.fresh(name, ttl) if ttl and candidates else {}
+    if cached:
+        wanted = {site.lower() for site in candidates}
+        cached = {key: entry for key, entry in cached.items() if key in wanted}
+    remaining = [site for site in candidates if site.lower() not in cached] if cached else site_filter
+    if cached and not site_filter:
+        # The remaining sites come from the bundled site list, so use it
+        cmd.append("--local")
+    for site in remaining or []:
+        cmd += ["--site", site]
+    if cached and not remaining:
+        # Every site has a fresh cached result; nothing to run
+        cmd = None
+    else:
+        cmd.append(name)
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", name)
+    output_path = f"/home/kasm-user/Desktop/Downloads/sherlock_{safe_name}_{ts}.txt"
+    job_scheduler.submit(name, cmd, output_path, timeout=run_timeout_min * 60 or None, cached=cached.values())
+
 if st.button("Search"):
-    if not username:
+    targets = list(dict.fromkeys(([username.strip()] if username.strip() else []) + batch_usernames))
+    if not targets:
         st.error("Enter a username to search.")
     else:
-        output_area = st.empty()
-        lines = []
-
-        # Loose-mode wildcard
-        if loose:
-            pattern = re.sub(r"[._-]+", "{?}", username)
-            usernames = [pattern]
-        else:
-            usernames = [username]
+        # Loose mode: each separator variant is its own search
+        usernames = list(dict.fromkeys(v for name in targets for v in (loose_variants(name) if loose else [name])))
 
         # Build command
+        # Sherlock's CSV/XLSX exports only contain the sites it checks itself,
+        # so cached sites are not skipped when an export is requested
+        cache_ttl = 0 if csv_out or xlsx_out else cache_ttl_hours * 3600
         cmd = ["sherlock"]
         for flag, opt in [
             (tor, "--tor"), (unique_tor, "--unique-tor"),
             (csv_out, "--csv"), (xlsx_out, "--xlsx"),
             (browse, "--browse"), (no_color, "--no-color"),
-            (nsfw, "--nsfw")
+            (nsfw, "--nsfw"), (print_all or cache_ttl, "--print-all")
         ]:
             if flag:
                 cmd.append(opt)
         cmd += ["--timeout", str(timeout)]
         if proxy:
             cmd += ["--proxy", proxy]
-        for site in [s.strip() for s in sites.split(",") if s.strip()]:
-            cmd += ["--site", site]
-        cmd += usernames
+        site_filter = [s.strip() for s in sites.split(",") if s.strip()] or None
 
-        # Launch and stream output
-        proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1
-        )
-        for ln in proc.stdout:
-            lines.append(ln.rstrip())
-            output_area.text("\n".join(lines))
+        for name in usernames:
+            submit_search(name, cmd, site_filter, cache_ttl)
+        if len(usernames) > 1:
+            st.success(f"Queued {len(usernames)} searches, {max_jobs} at a time.")
 
-        proc.wait()
-        if proc.returncode != 0:
-            st.error(f"Sherlock exited with code {proc.returncode}")
-        else:
-            st.success("Sherlock completed successfully!")
+render_metrics()
+
+# Searches panel: job table, the selected search's live output, and its outcome
+jobs = job_scheduler.snapshot()
+if jobs:
+    st.subheader("Searches")
+    jobs_area = st.empty()
+    render_jobs(jobs_area, jobs)
+    jobs_by_id = {job["id"]: job for job in jobs}
+    j1, j2 = st.columns([4, 1])
+    picked_id = j1.selectbox(
+        "Show output for:", list(jobs_by_id),
+        format_func=lambda job_id: f"#{job_id} {jobs_by_id[job_id]['label']} ({jobs_by_id[job_id]['state']})"
+    )
+    picked = jobs_by_id[picked_id]
+    if j2.button("Cancel search", disabled=picked["state"] not in JOB_ACTIVE_STATES):
+        job_scheduler.cancel(picked_id)
+        st.experimental_rerun()
+    counts_area = st.empty()
+    render_counts(counts_area, picked)
+    hits = job_scheduler.hits(picked_id)
+    hits_table = st.dataframe(hits_frame(hits), use_container_width=True, hide_index=True)
+    shown = len(hits)
+    with st.expander(f"Transcript (last {TRANSCRIPT_TAIL_LINES} lines; full output in Downloads)"):
+        output_area = st.empty()
+        output_area.text("\n".join(picked["lines"]))
+    if picked["state"] == "timed out":
+        st.warning("Sherlock hit the time limit and was stopped.")
+    elif picked["state"] == "cancelled":
+        st.warning("Search cancelled.")
+    elif picked["state"] == "failed":
+        st.error(picked["error"] or f"Sherlock exited with code {picked['returncode']}")
+    elif picked["state"] == "done":
+        st.success("Sherlock completed successfully!")
+
+    # Keep the tables and the selected output live while searches are active,
+    # appending only new hits within the render budget; rerun when any search
+    # changes state so outcomes are shown.
+    if job_scheduler.active():
+        watched = [(job["id"], job["state"]) for job in jobs]
+        rendered, line_count = time.monotonic(), picked["line_count"]
+        while job_scheduler.active():
+            time.sleep(RENDER_POLL)
+            new_hits = job_scheduler.hits(picked_id, shown)
+            if time.monotonic() - rendered < RENDER_INTERVAL and len(new_hits) < RENDER_BATCH_ROWS:
+                continue
+            rendered = time.monotonic()
+            current = job_scheduler.snapshot()
+            picked = next(j for j in current if j["id"] == picked_id)
+            render_jobs(jobs_area, current)
+            render_metrics()
+            render_counts(counts_area, picked)
+            if new_hits:
+                hits_table.add_rows(hits_frame(new_hits, shown))
+                shown += len(new_hits)
+            if picked["line_count"] != line_count:
+                output_area.text("\n".join(picked["lines"]))
+                line_count = picked["line_count"]
+            if [(job["id"], job["state"]) for job in current] != watched:
+                break
+        st.experimental_rerun()
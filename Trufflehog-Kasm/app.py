@@ -1,15 +1,32 @@
 import os
+import csv
+import email.utils
+import functools
+import gzip
+import hashlib
+import heapq
+import http.server
 import json
+import queue
+import re
+import shutil
+import sqlite3
 import subprocess
 import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
 from datetime import datetime
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urldefrag, urljoin, urlparse
 
-import pandas as pd
-import requests
 import streamlit as st
-import tldextract
-from bs4 import BeautifulSoup
+
+# Fast start: pandas, requests, tldextract, BeautifulSoup and lxml are imported
+# inside the functions that use them, so a script run only pays for the
+# libraries its scan mode needs. Each page setup is timed (see below).
+script_started = time.perf_counter()
 
 # Page configuration
 st.set_page_config(page_title="Trufflehog WebUI", layout="wide")
@@ -56,77 +73,1950 @@ desc = {
 scan_mode = st.sidebar.selectbox("Scan Mode:", list(desc.keys()))
 st.sidebar.markdown(f"**Description:** {desc[scan_mode]}")
 
-# Unified TruffleHog runner with optional streaming to file
-def run_trufflehog(cmd, out_file_path=None):
+# Scan limits: a wall-clock cap per external process, and a cancel button.
+# Clicking Cancel reruns the script, which interrupts the running scan and
+# kills its child process; findings so far stay in the JSONL output file.
+scan_timeout_min = st.sidebar.number_input("Scan time limit (minutes, 0 = none):", 0, 24 * 60, 0)
+scan_timeout = scan_timeout_min * 60 or None
+st.sidebar.button("⏹ Cancel running scan")
+max_jobs = st.sidebar.number_input("Concurrent background scan jobs:", 1, 64, min(os.cpu_count() or 2, 8))
+
+# Instrumentation: per-stage timers (fetch, parse, spool write, process
+# spawn, scan batch, JSON parse, store) and counters are aggregated for the
+# whole app in the sidebar panel, written per scan as a JSONL trace next to
+# the scan's output, and, when TRUFFLEHOG_METRICS_PORT is set, served in
+# Prometheus text format on localhost. Each scan passes its own trace down to
+# the fetches, batches and processes it starts, so concurrent sessions never
+# share one.
+METRICS_SAMPLES = 2048
+METRICS_PORT = int(os.environ.get("TRUFFLEHOG_METRICS_PORT") or 0)
+TRACE_SUFFIX = ".trace.jsonl"
+TRACE_FLUSH_EVENTS = 1000
+
+class StageMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.counters = {}
+            self.started = time.time()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = {
+                    "count": 0, "total": 0.0, "max": 0.0, "samples": deque(maxlen=METRICS_SAMPLES)
+                }
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            entry["samples"].append(seconds)
+
+    def incr(self, counter, n=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def summary(self):
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            stages = {}
+            for stage, entry in self.stages.items():
+                samples = sorted(entry["samples"])
+                stages[stage] = {
+                    "count": entry["count"], "total_s": round(entry["total"], 3),
+                    "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+                    "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+                    "max_ms": round(entry["max"] * 1000, 2)
+                }
+            counters = {name: {"total": value, "per_sec": round(value / elapsed, 2)}
+                        for name, value in self.counters.items()}
+        return {"elapsed_s": round(elapsed, 1), "stages": stages, "counters": counters}
+
+    def prometheus(self, prefix):
+        summary = self.summary()
+        lines = [f"# TYPE {prefix}_stage_seconds summary"]
+        for stage, stats in summary["stages"].items():
+            for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+                lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {stats[key] / 1000}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["total_s"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        for name, stats in summary["counters"].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {stats['total']}")
+        return "\n".join(lines) + "\n"
+
+class ScanTrace:
+    def __init__(self, path):
+        self.path = path
+        self.metrics = StageMetrics()
+        self.lock = threading.Lock()
+        self.events = []
+        self.started = time.monotonic()
+
+    def record(self, stage, seconds, fields):
+        self.metrics.observe(stage, seconds)
+        event = {"t": round(time.monotonic() - self.started - seconds, 4), "stage": stage,
+                 "ms": round(seconds * 1000, 3), **fields}
+        with self.lock:
+            self.events.append(event)
+            if len(self.events) >= TRACE_FLUSH_EVENTS:
+                self._flush()
+
+    def _flush(self):
+        if self.events:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write("".join(json.dumps(event) + "\n" for event in self.events))
+            self.events = []
+
+    def close(self):
+        with self.lock:
+            self.events.append({"summary": self.metrics.summary()})
+            self._flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Instrumentation:
+    def __init__(self):
+        self.totals = StageMetrics()
+        self.startup = {}
+
+    def observe(self, stage, seconds, trace=None, **fields):
+        self.totals.observe(stage, seconds)
+        if trace is not None:
+            trace.record(stage, seconds, fields)
+
+    @contextmanager
+    def timer(self, stage, trace=None, **fields):
+        started = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            self.observe(stage, time.perf_counter() - started, trace, **fields)
+
+    def incr(self, counter, n=1, trace=None):
+        self.totals.incr(counter, n)
+        if trace is not None:
+            trace.metrics.incr(counter, n)
+
+@st.cache_resource
+def get_instrumentation():
+    return Instrumentation()
+
+metrics = get_instrumentation()
+
+@st.cache_resource
+def start_metrics_server(port, _metrics):
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = _metrics.totals.prometheus("trufflehog_webui").encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if METRICS_PORT:
+    start_metrics_server(METRICS_PORT, metrics)
+
+metrics_expander = st.sidebar.expander("📈 Scan metrics")
+if metrics_expander.button("Reset metrics"):
+    metrics.totals.reset()
+metrics_panel = metrics_expander.empty()
+
+def render_metrics():
+    summary = metrics.totals.summary()
+    with metrics_panel.container():
+        if not summary["stages"]:
+            st.caption("No scan activity recorded yet.")
+        else:
+            import pandas as pd
+            st.dataframe(pd.DataFrame([
+                {"Stage": stage, "Count": stats["count"], "Total (s)": stats["total_s"],
+                 "p50 (ms)": stats["p50_ms"], "p95 (ms)": stats["p95_ms"]}
+                for stage, stats in summary["stages"].items()
+            ]), hide_index=True)
+            st.dataframe(pd.DataFrame([
+                {"Counter": name, "Total": stats["total"], "Per sec": stats["per_sec"]}
+                for name, stats in summary["counters"].items()
+            ]), hide_index=True)
+        st.caption(f"Since {datetime.fromtimestamp(metrics.totals.started):%H:%M:%S}; "
+                   f"per-scan traces are saved as *{TRACE_SUFFIX} next to each output file.")
+        if METRICS_PORT:
+            st.caption(f"Prometheus metrics: http://127.0.0.1:{METRICS_PORT}/metrics")
+        if metrics.startup:
+            st.caption(f"Page setup: {metrics.startup['page_setup'] * 1000:.0f} ms "
+                       f"(first run of this server: {metrics.startup['first_page_setup'] * 1000:.0f} ms)")
+
+# Generic process runner: stdout and stderr are drained on background threads
+# so a chatty child can never block on a full pipe, stdout lines are handed to
+# on_line as they arrive, and an optional wall-clock limit or cancel event
+# stops the child early. A Streamlit Stop/rerun raises inside the callbacks,
+# and the finally block makes sure the child does not outlive the script run.
+def run_process(cmd, on_line, timeout=None, cancel_event=None, on_progress=None,
+                progress_interval=1.0, merge_stderr=False, stderr_lines=50, trace=None):
+    with metrics.timer("process_spawn", trace, command=os.path.basename(cmd[0])):
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE
+        )
+    metrics.incr("process_spawns", trace=trace)
+    line_queue = queue.Queue()
+    stderr_tail = deque(maxlen=stderr_lines)
+    stats = {"lines": 0, "bytes": 0, "elapsed": 0.0, "timed_out": False, "cancelled": False}
+
+    def drain(stream, name):
+        for raw in iter(stream.readline, b""):
+            line_queue.put((name, raw))
+        stream.close()
+        line_queue.put((name, None))
+
+    streams = [(proc.stdout, "stdout")]
+    if not merge_stderr:
+        streams.append((proc.stderr, "stderr"))
+    for stream, name in streams:
+        threading.Thread(target=drain, args=(stream, name), daemon=True).start()
+
+    def update_stats():
+        stats["elapsed"] = time.monotonic() - start
+        elapsed = max(stats["elapsed"], 1e-6)
+        stats["lines_per_sec"] = stats["lines"] / elapsed
+        stats["bytes_per_sec"] = stats["bytes"] / elapsed
+
+    start = last_progress = time.monotonic()
+    open_streams = len(streams)
+    finished = False
+    try:
+        while open_streams:
+            now = time.monotonic()
+            if timeout and now - start > timeout:
+                stats["timed_out"] = True
+                break
+            if cancel_event is not None and cancel_event.is_set():
+                stats["cancelled"] = True
+                break
+            if on_progress and now - last_progress >= progress_interval:
+                last_progress = now
+                update_stats()
+                on_progress(stats)
+            try:
+                name, raw = line_queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if raw is None:
+                open_streams -= 1
+                continue
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            if name == "stderr":
+                stderr_tail.append(line)
+                continue
+            stats["lines"] += 1
+            stats["bytes"] += len(raw)
+            on_line(line)
+        finished = not (stats["timed_out"] or stats["cancelled"])
+    finally:
+        if not finished and proc.poll() is None:
+            proc.kill()
+        proc.wait()
+    update_stats()
+    stats["returncode"] = proc.returncode
+    stats["stderr"] = "\n".join(stderr_tail)
+    return stats
+
+def format_progress(stats):
+    return (
+        f"{stats['lines']} lines · {stats['bytes'] / 1e6:.1f} MB read · "
+        f"{stats['lines_per_sec']:.0f} lines/s · {stats['bytes_per_sec'] / 1e6:.2f} MB/s · "
+        f"{stats['elapsed']:.0f}s elapsed"
+    )
+
+# Scan state (findings, caches, site indexes) lives under STATE_DIR
+STATE_DIR = os.environ.get("TRUFFLEHOG_STATE_DIR", "/home/kasm-user/.cache/trufflehog-webui")
+
+# Findings store: every finding is written to SQLite as it is parsed, keyed by
+# scan, so the results view can page, filter and aggregate with indexed
+# queries instead of holding a whole scan's findings in memory.
+#
+# Findings are deduplicated by fingerprint (detector plus normalized secret):
+# a secret seen on many pages or in many commits is stored once per scan with
+# a count and a lightweight occurrence list, and the fingerprints table keeps
+# a persistent first/last-seen history across scans. Each scan records the
+# previous completed scan of the same target so findings can be flagged as
+# new; cancelled, failed, timed-out or interrupted scans never serve as one.
+FINDINGS_DB_PATH = os.path.join(STATE_DIR, "findings.db")
+FINDINGS_COMMIT_EVERY = 500
+
+def finding_fingerprint(record):
+    raw = " ".join(str(record.get("Raw") or record.get("RawV2") or "").split())
+    return hashlib.sha256(f"{record.get('DetectorName', '')}\0{raw}".encode()).hexdigest()
+
+class FindingsStore:
+    def __init__(self, path=FINDINGS_DB_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS scans (
+                scan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scan_mode TEXT NOT NULL,
+                output_path TEXT,
+                started_at REAL NOT NULL,
+                target TEXT,
+                previous_scan_id INTEGER,
+                state TEXT NOT NULL DEFAULT 'running'
+            );
+            CREATE TABLE IF NOT EXISTS findings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scan_id INTEGER NOT NULL,
+                source_name TEXT,
+                source_url TEXT,
+                detector_name TEXT,
+                verified INTEGER NOT NULL,
+                raw TEXT,
+                record TEXT NOT NULL,
+                fingerprint TEXT,
+                occurrences INTEGER NOT NULL DEFAULT 1,
+                is_new INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE TABLE IF NOT EXISTS occurrences (
+                finding_id INTEGER NOT NULL,
+                source_name TEXT,
+                source_url TEXT,
+                metadata TEXT
+            );
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                fingerprint TEXT PRIMARY KEY,
+                detector_name TEXT,
+                first_scan_id INTEGER NOT NULL,
+                first_seen_at REAL NOT NULL,
+                last_scan_id INTEGER NOT NULL,
+                last_seen_at REAL NOT NULL,
+                scans INTEGER NOT NULL DEFAULT 1
+            );
+            """
+        )
+        # Databases created before deduplication lack the newer columns; scans
+        # recorded before completion states existed count as complete
+        for table, column, decl in [
+            ("scans", "target", "TEXT"),
+            ("scans", "previous_scan_id", "INTEGER"),
+            ("scans", "state", "TEXT NOT NULL DEFAULT 'complete'"),
+            ("findings", "fingerprint", "TEXT"),
+            ("findings", "occurrences", "INTEGER NOT NULL DEFAULT 1"),
+            ("findings", "is_new", "INTEGER NOT NULL DEFAULT 1"),
+        ]:
+            if column not in {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        self.conn.executescript(
+            """
+            CREATE INDEX IF NOT EXISTS findings_scan ON findings (scan_id);
+            CREATE INDEX IF NOT EXISTS findings_detector ON findings (scan_id, detector_name);
+            CREATE INDEX IF NOT EXISTS findings_verified ON findings (scan_id, verified);
+            CREATE INDEX IF NOT EXISTS findings_source ON findings (scan_id, source_name);
+            CREATE UNIQUE INDEX IF NOT EXISTS findings_fingerprint ON findings (scan_id, fingerprint);
+            CREATE INDEX IF NOT EXISTS occurrences_finding ON occurrences (finding_id);
+            CREATE INDEX IF NOT EXISTS scans_target ON scans (target, scan_id);
+            """
+        )
+        self.conn.commit()
+        self.uncommitted = 0
+        self.previous_scans = {}
+
+    def start_scan(self, scan_mode, output_path, target=None):
+        previous = self.conn.execute(
+            "SELECT MAX(scan_id) FROM scans WHERE target = ? AND state = 'complete'", (target,)
+        ).fetchone()[0] if target else None
+        cur = self.conn.execute(
+            "INSERT INTO scans (scan_mode, output_path, started_at, target, previous_scan_id, state) "
+            "VALUES (?, ?, ?, ?, ?, 'running')",
+            (scan_mode, output_path, time.time(), target, previous)
+        )
+        self.conn.commit()
+        return cur.lastrowid
+
+    def finish_scan(self, scan_id, state):
+        self.conn.execute("UPDATE scans SET state = ? WHERE scan_id = ?", (state, scan_id))
+        self.conn.commit()
+
+    def previous_scan(self, scan_id):
+        if scan_id not in self.previous_scans:
+            row = self.conn.execute("SELECT previous_scan_id FROM scans WHERE scan_id = ?", (scan_id,)).fetchone()
+            self.previous_scans[scan_id] = row[0] if row else None
+        return self.previous_scans[scan_id]
+
+    def add(self, scan_id, record):
+        fingerprint = finding_fingerprint(record)
+        previous = self.previous_scan(scan_id)
+        is_new = previous is None or self.conn.execute(
+            "SELECT 1 FROM findings WHERE scan_id = ? AND fingerprint = ?", (previous, fingerprint)
+        ).fetchone() is None
+        verified = int(bool(record.get("Verified")))
+        self.conn.execute(
+            "INSERT INTO findings (scan_id, source_name, source_url, detector_name, verified, raw, record, "
+            "fingerprint, is_new) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (scan_id, fingerprint) DO UPDATE SET "
+            "occurrences = occurrences + 1, verified = max(verified, excluded.verified)",
+            (scan_id, record.get("SourceName", ""), record.get("SourceURL", ""),
+             record.get("DetectorName", ""), verified, record.get("Raw", ""), json.dumps(record),
+             fingerprint, int(is_new))
+        )
+        finding_id = self.conn.execute(
+            "SELECT id FROM findings WHERE scan_id = ? AND fingerprint = ?", (scan_id, fingerprint)
+        ).fetchone()[0]
+        self.conn.execute(
+            "INSERT INTO occurrences (finding_id, source_name, source_url, metadata) VALUES (?, ?, ?, ?)",
+            (finding_id, record.get("SourceName", ""), record.get("SourceURL", ""),
+             json.dumps(record.get("SourceMetadata") or {}))
+        )
+        now = time.time()
+        self.conn.execute(
+            "INSERT INTO fingerprints (fingerprint, detector_name, first_scan_id, first_seen_at, "
+            "last_scan_id, last_seen_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (fingerprint) DO UPDATE SET scans = scans + (last_scan_id != excluded.last_scan_id), "
+            "last_scan_id = excluded.last_scan_id, last_seen_at = excluded.last_seen_at",
+            (fingerprint, record.get("DetectorName", ""), scan_id, now, scan_id, now)
+        )
+        self.uncommitted += 1
+        if self.uncommitted >= FINDINGS_COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self.uncommitted = 0
+
+    def _where(self, scan_id, detector=None, source=None, verified_only=False, new_only=False, search=None):
+        clauses, params = ["scan_id = ?"], [scan_id]
+        if search:
+            clauses.append(
+                "(detector_name LIKE ? OR source_name LIKE ? OR source_url LIKE ? OR raw LIKE ?)"
+            )
+            params.extend([f"%{search}%"] * 4)
+        if detector:
+            clauses.append("detector_name = ?")
+            params.append(detector)
+        if source:
+            clauses.append("source_name = ?")
+            params.append(source)
+        if verified_only:
+            clauses.append("verified = 1")
+        if new_only:
+            clauses.append("is_new = 1")
+        return " AND ".join(clauses), params
+
+    def count(self, scan_id, **filters):
+        where, params = self._where(scan_id, **filters)
+        return self.conn.execute(f"SELECT COUNT(*) FROM findings WHERE {where}", params).fetchone()[0]
+
+    def occurrence_count(self, scan_id, **filters):
+        where, params = self._where(scan_id, **filters)
+        return self.conn.execute(
+            f"SELECT COALESCE(SUM(occurrences), 0) FROM findings WHERE {where}", params
+        ).fetchone()[0]
+
+    def counts_by(self, scan_id, column, label, **filters):
+        import pandas as pd
+        where, params = self._where(scan_id, **filters)
+        return pd.read_sql_query(
+            f"SELECT {column} AS {label}, COUNT(*) AS Findings, SUM(occurrences) AS Occurrences, "
+            f"SUM(verified) AS Verified FROM findings WHERE {where} GROUP BY {column} ORDER BY Findings DESC",
+            self.conn, params=params
+        )
+
+    def summary(self, scan_id, limit=-1, offset=0, **filters):
+        import pandas as pd
+        where, params = self._where(scan_id, **filters)
+        df = pd.read_sql_query(
+            "SELECT id, source_name AS SourceName, source_url AS SourceURL, detector_name AS DetectorName, "
+            "verified AS Verified, CASE WHEN raw != '' THEN substr(raw, 1, 20) || '...' ELSE '' END AS Raw, "
+            "occurrences AS Occurrences, is_new AS New "
+            f"FROM findings WHERE {where} ORDER BY id LIMIT ? OFFSET ?",
+            self.conn, params=params + [limit, offset]
+        )
+        df["Verified"] = df["Verified"].astype(bool)
+        df["New"] = df["New"].astype(bool)
+        return df.set_index("id")
+
+    def scan_output_path(self, scan_id):
+        row = self.conn.execute("SELECT output_path FROM scans WHERE scan_id = ?", (scan_id,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def get(self, finding_id):
+        row = self.conn.execute("SELECT record FROM findings WHERE id = ?", (finding_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def occurrences(self, finding_id, limit=1000):
+        import pandas as pd
+        return pd.read_sql_query(
+            "SELECT source_name AS SourceName, source_url AS SourceURL, metadata AS Location "
+            "FROM occurrences WHERE finding_id = ? ORDER BY rowid LIMIT ?",
+            self.conn, params=[finding_id, limit]
+        )
+
+    def history(self, finding_id):
+        return self.conn.execute(
+            "SELECT p.first_scan_id, p.first_seen_at, p.last_scan_id, p.scans FROM findings f "
+            "JOIN fingerprints p ON p.fingerprint = f.fingerprint WHERE f.id = ?", (finding_id,)
+        ).fetchone()
+
+    # One record per occurrence, rebuilt from the deduplicated finding
+    def records(self, scan_id, **filters):
+        where, params = self._where(scan_id, **filters)
+        rows = self.conn.execute(
+            "SELECT f.record, o.source_name, o.source_url, o.metadata FROM occurrences o "
+            f"JOIN (SELECT id, record FROM findings WHERE {where}) f ON f.id = o.finding_id ORDER BY o.rowid",
+            params
+        )
+        for record, source_name, source_url, metadata in rows:
+            record = json.loads(record)
+            record.update(SourceName=source_name, SourceURL=source_url, SourceMetadata=json.loads(metadata))
+            yield record
+
+findings_store = FindingsStore()
+
+def start_scan(output_path, target=None):
+    scan_id = findings_store.start_scan(scan_mode, output_path, target)
+    st.session_state["scan_id"] = scan_id
+    return scan_id
+
+# Unified TruffleHog runner with optional streaming to file. With a scan_id,
+# findings go straight into the findings store instead of being returned.
+def run_trufflehog(cmd, out_file_path=None, annotate=None, run_stats=None, scan_id=None, trace=None):
     records = []
+    found = 0
+    out_f = None
     if out_file_path:
         os.makedirs(os.path.dirname(out_file_path), exist_ok=True)
-        mode = 'a' if os.path.exists(out_file_path) else 'w'
-        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        with open(out_file_path, mode) as out_f:
-            for line in proc.stdout:
-                out_f.write(line)
-                out_f.flush()
-                try:
-                    records.append(json.loads(line))
-                except:
-                    continue
-        stderr = proc.stderr.read()
-        proc.wait()
-        if proc.returncode != 0:
-            st.error(f"TruffleHog error: {stderr.strip()}")
-        return records
-    else:
-        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        if proc.returncode != 0:
-            st.error(f"TruffleHog error: {proc.stderr.strip()}")
-            return []
-        for line in proc.stdout.splitlines():
+        out_f = open(out_file_path, 'a')
+    status = st.empty()
+
+    def on_line(line):
+        try:
+            with metrics.timer("json_parse", trace):
+                record = json.loads(line)
+        except ValueError:
+            if out_f:
+                out_f.write(line + "\n")
+            return
+        if annotate:
+            annotate(record)
+            line = json.dumps(record)
+        if out_f:
+            out_f.write(line + "\n")
+            out_f.flush()
+        nonlocal found
+        found += 1
+        if scan_id is None:
+            records.append(record)
+        else:
+            with metrics.timer("store", trace):
+                findings_store.add(scan_id, record)
+
+    try:
+        result = run_process(
+            cmd, on_line, timeout=scan_timeout,
+            on_progress=lambda stats: status.caption(f"TruffleHog: {format_progress(stats)}"), trace=trace
+        )
+    finally:
+        if out_f:
+            out_f.close()
+        if scan_id is not None:
+            findings_store.commit()
+        status.empty()
+    if run_stats is not None:
+        run_stats.update(result)
+    if result["timed_out"]:
+        st.warning(f"TruffleHog hit the {scan_timeout_min}-minute scan limit; keeping {found} findings so far.")
+    elif result["returncode"] != 0:
+        st.error(f"TruffleHog error: {result['stderr'].strip()}")
+    return records
+
+# Background scan jobs: command-line scan modes run as trufflehog child
+# processes managed by a scheduler kept in Streamlit's resource cache, so jobs
+# survive reruns and several can run side by side up to the configured limit.
+# Each job streams into its own JSONL output file and into its scan's rows in
+# the findings store; the page polls job state while any job is active.
+JOB_ACTIVE_STATES = ("queued", "running")
+
+class JobScheduler:
+    def __init__(self, max_running=2):
+        self.lock = threading.Lock()
+        self.max_running = max_running
+        self.jobs = {}
+        self.queue = deque()
+        self.counter = 0
+        self.output_locks = {}
+
+    def set_limit(self, max_running):
+        with self.lock:
+            self.max_running = max_running
+        self._dispatch()
+
+    def output_lock(self, output_path):
+        with self.lock:
+            return self.output_locks.setdefault(output_path, threading.Lock())
+
+    def submit(self, label, cmd, output_path, scan_id, timeout=None):
+        with self.lock:
+            self.counter += 1
+            job = {
+                "id": self.counter, "label": label, "cmd": cmd, "output_path": output_path,
+                "scan_id": scan_id, "timeout": timeout, "state": "queued",
+                "submitted": time.time(), "started": None, "finished": None,
+                "findings": 0, "progress": "", "error": "", "cancel": threading.Event()
+            }
+            self.jobs[job["id"]] = job
+            self.queue.append(job)
+        self._dispatch()
+        return job["id"]
+
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["state"] not in JOB_ACTIVE_STATES:
+                return
+            job["cancel"].set()
+            if job["state"] != "queued":
+                return
+            self.queue.remove(job)
+            job["state"] = "cancelled"
+            job["finished"] = time.time()
+        self._finish_scan(job["scan_id"])
+
+    def active(self):
+        with self.lock:
+            return any(job["state"] in JOB_ACTIVE_STATES for job in self.jobs.values())
+
+    def snapshot(self):
+        with self.lock:
+            return [
+                {k: v for k, v in job.items() if k not in ("cmd", "cancel")}
+                for job in sorted(self.jobs.values(), key=lambda j: j["id"], reverse=True)
+            ]
+
+    def _dispatch(self):
+        with self.lock:
+            running = sum(1 for job in self.jobs.values() if job["state"] == "running")
+            while self.queue and running < self.max_running:
+                job = self.queue.popleft()
+                job["state"] = "running"
+                job["started"] = time.time()
+                running += 1
+                threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        try:
+            self._execute(job)
+        except Exception as e:
+            job["state"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["finished"] = time.time()
+            self._finish_scan(job["scan_id"])
+            self._dispatch()
+
+    # Bulk jobs share a scan, which is complete only once all of its jobs
+    # have finished successfully
+    def _finish_scan(self, scan_id):
+        if scan_id is None:
+            return
+        with self.lock:
+            jobs = [job for job in self.jobs.values() if job["scan_id"] == scan_id]
+            if any(job["state"] in JOB_ACTIVE_STATES for job in jobs):
+                return
+            state = "complete" if all(job["state"] == "done" for job in jobs) else "incomplete"
+        store = FindingsStore()
+        try:
+            store.finish_scan(scan_id, state)
+        finally:
+            store.close()
+
+    def _execute(self, job):
+        store = FindingsStore()
+        trace = ScanTrace(job["output_path"] + TRACE_SUFFIX)
+        os.makedirs(os.path.dirname(job["output_path"]), exist_ok=True)
+        # Bulk jobs share one output file, so whole lines are written under a lock
+        out_lock = self.output_lock(job["output_path"])
+        try:
+            with open(job["output_path"], "a") as out_f, metrics.timer("scan_job", trace, job=job["id"]):
+                def on_line(line):
+                    with out_lock:
+                        out_f.write(line + "\n")
+                        out_f.flush()
+                    try:
+                        with metrics.timer("json_parse", trace):
+                            record = json.loads(line)
+                    except ValueError:
+                        return
+                    with metrics.timer("store", trace):
+                        store.add(job["scan_id"], record)
+                    metrics.incr("findings", trace=trace)
+                    job["findings"] += 1
+
+                def on_progress(stats):
+                    store.commit()
+                    job["progress"] = format_progress(stats)
+
+                result = run_process(
+                    job["cmd"], on_line, timeout=job["timeout"],
+                    cancel_event=job["cancel"], on_progress=on_progress, trace=trace
+                )
+        finally:
+            store.close()
+            trace.close()
+        job["progress"] = format_progress(result)
+        if result["cancelled"]:
+            job["state"] = "cancelled"
+        elif result["timed_out"]:
+            job["state"] = "timed out"
+        elif result["returncode"] != 0:
+            job["state"] = "failed"
+            job["error"] = result["stderr"].strip()
+        else:
+            job["state"] = "done"
+
+@st.cache_resource
+def get_job_scheduler():
+    return JobScheduler()
+
+job_scheduler = get_job_scheduler()
+job_scheduler.set_limit(max_jobs)
+
+def submit_scan_job(cmd, output_path, scan_id):
+    job_id = job_scheduler.submit(scan_mode, cmd, output_path, scan_id, timeout=scan_timeout)
+    st.success(f"Queued job #{job_id}; findings will appear below as it runs.")
+    return job_id
+
+# Bulk mode: many targets (or filesystem shards) fan out into one job each.
+# All jobs share a scan id and output file so their JSONL streams merge into
+# a single result set, and each process gets a share of the CPU cores via
+# --concurrency so parallel jobs do not oversubscribe the machine.
+def bulk_targets_input(label, key):
+    pasted = st.text_area(f"{label} (one per line):", "", key=f"{key}_pasted")
+    uploaded = st.file_uploader(f"...or upload a list of {label.lower()}:", type=["txt", "csv"], key=f"{key}_file")
+    lines = pasted.splitlines()
+    if uploaded is not None:
+        lines += uploaded.getvalue().decode("utf-8", errors="replace").splitlines()
+    targets = [line.strip().split(",")[0].strip() for line in lines]
+    return list(dict.fromkeys(t for t in targets if t and not t.startswith("#")))
+
+def submit_bulk_jobs(labelled_cmds, output_path, scan_id):
+    if not labelled_cmds:
+        st.error("Nothing to scan: none of the targets has any content.")
+        return
+    parallel = max(1, min(len(labelled_cmds), job_scheduler.max_running))
+    per_job = max(1, (os.cpu_count() or 1) // parallel)
+    for label, cmd in labelled_cmds:
+        job_scheduler.submit(label, cmd + [f"--concurrency={per_job}"], output_path, scan_id, timeout=scan_timeout)
+    st.success(
+        f"Queued {len(labelled_cmds)} jobs ({parallel} at a time, {per_job} threads each); "
+        "their findings merge into one result set below."
+    )
+
+def shard_paths(paths, shards, max_children=1000):
+    # Overlapping inputs (the same tree, or a path inside another input) are
+    # scanned once, from the outermost path
+    roots = {os.path.realpath(p) for p in paths}
+    paths = sorted(p for p in roots if not any(p != r and os.path.commonpath([p, r]) == r for r in roots))
+
+    # Directory sizes in one bottom-up walk per root
+    sizes = {}
+    for root in paths:
+        if os.path.isdir(root):
+            for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+                total = sum(sizes.get(os.path.join(dirpath, d), 0) for d in dirnames)
+                for name in filenames:
+                    try:
+                        total += os.path.getsize(os.path.join(dirpath, name))
+                    except OSError:
+                        pass
+                sizes[dirpath] = total
+        elif os.path.exists(root):
+            sizes[root] = os.path.getsize(root)
+    target = sum(sizes.get(p, 0) for p in paths) / max(shards, 1)
+
+    # Split directories that are larger than one shard's share into their children
+    items, stack = [], [p for p in paths if p in sizes]
+    while stack:
+        path = stack.pop()
+        size = sizes.get(path)
+        if size is None:
             try:
-                records.append(json.loads(line))
-            except:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+        children = os.listdir(path) if os.path.isdir(path) and size > target else []
+        if children and len(children) <= max_children:
+            stack.extend(os.path.join(path, c) for c in children)
+        else:
+            items.append((size, path))
+
+    # Greedy largest-first packing into the currently smallest shard
+    bins = [(0, i, []) for i in range(max(1, min(shards, len(items))))]
+    heapq.heapify(bins)
+    for size, path in sorted(items, reverse=True):
+        total, i, members = heapq.heappop(bins)
+        members.append(path)
+        heapq.heappush(bins, (total + size, i, members))
+    return [members for _, _, members in sorted(bins, key=lambda b: b[1]) if members]
+
+def render_jobs(area, jobs):
+    import pandas as pd
+    now = time.time()
+    area.dataframe(pd.DataFrame([{
+        "Job": job["id"],
+        "Scan": job["label"],
+        "State": job["state"],
+        "Findings": job["findings"],
+        "Elapsed": f"{((job['finished'] or now) - job['started']):.0f}s" if job["started"] else "",
+        "Progress": job["error"] or job["progress"],
+        "Output": os.path.basename(job["output_path"])
+    } for job in jobs]), use_container_width=True, hide_index=True)
+
+# Content-addressed scan cache: maps the SHA-256 of a fetched body to the
+# findings TruffleHog reported for it, so byte-identical pages (soft 404s,
+# shared bundles, templated error pages) are only ever scanned once. Entries
+# are evicted least-recently-used first once the count or size bound is hit.
+# Results that carry findings expire quickly so TruffleHog re-verifies the
+# secrets (a revoked key stops showing as verified, a failed check is retried);
+# results without findings are kept longer.
+SCAN_CACHE_PATH = os.path.join(STATE_DIR, "scan_cache.db")
+SCAN_CACHE_MAX_ENTRIES = 100_000
+SCAN_CACHE_MAX_BYTES = 256 * 1024 * 1024
+SCAN_CACHE_FINDINGS_TTL = 3600
+SCAN_CACHE_TTL = 7 * 24 * 3600
+
+class ScanCache:
+    def __init__(self, path=SCAN_CACHE_PATH, max_entries=SCAN_CACHE_MAX_ENTRIES, max_bytes=SCAN_CACHE_MAX_BYTES):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS scan_cache ("
+            "digest TEXT PRIMARY KEY, findings TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL, "
+            "scanned_at REAL NOT NULL DEFAULT 0, has_findings INTEGER NOT NULL DEFAULT 1)"
+        )
+        # Caches created before expiry lack the newer columns; their entries
+        # count as expired
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(scan_cache)")}
+        for column, decl in [("scanned_at", "REAL NOT NULL DEFAULT 0"), ("has_findings", "INTEGER NOT NULL DEFAULT 1")]:
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE scan_cache ADD COLUMN {column} {decl}")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS scan_cache_last_used ON scan_cache (last_used)")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest):
+        row = self.conn.execute(
+            "SELECT findings, scanned_at, has_findings FROM scan_cache WHERE digest = ?", (digest,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > (SCAN_CACHE_FINDINGS_TTL if row[2] else SCAN_CACHE_TTL):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute("UPDATE scan_cache SET last_used = ? WHERE digest = ?", (time.time(), digest))
+        return json.loads(row[0])
+
+    def put(self, digest, findings):
+        data, now = json.dumps(findings), time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO scan_cache (digest, findings, size, last_used, scanned_at, has_findings) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (digest, data, len(digest) + len(data), now, now, int(bool(findings)))
+        )
+
+    def evict(self):
+        count, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM scan_cache").fetchone()
+        while count > self.max_entries or size > self.max_bytes:
+            self.conn.execute(
+                "DELETE FROM scan_cache WHERE digest IN "
+                "(SELECT digest FROM scan_cache ORDER BY last_used LIMIT ?)",
+                (max(count - self.max_entries, count // 10, 1),)
+            )
+            count, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM scan_cache").fetchone()
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+# Batching scan stage: fetched bodies are spooled to one directory and scanned
+# with a single trufflehog process per batch instead of one process per page.
+# Bodies already in the scan cache, or already spooled in the current batch,
+# are not written again; their findings are re-emitted for the new URL.
+SCAN_BATCH_FILES = 200
+SCAN_BATCH_BYTES = 32 * 1024 * 1024
+
+class ScanSpool:
+    def __init__(self, out_file_path, scan_id=None, max_files=SCAN_BATCH_FILES, max_bytes=SCAN_BATCH_BYTES,
+                 use_cache=True, trace=None):
+        self.out_file_path = out_file_path
+        self.scan_id = scan_id
+        self.trace = trace
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.cache = ScanCache() if use_cache else None
+        self.spool_dir = tempfile.mkdtemp(prefix="trufflehog_spool_")
+        self.incoming_dir = tempfile.mkdtemp(prefix="trufflehog_incoming_")
+        self.sources = {}
+        self.urls = {}
+        self.spooled_bytes = 0
+        self.counter = 0
+        self.bodies = 0
+        self.reused = 0
+        self.findings = 0
+        self.complete = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        try:
+            # An interrupted scan is resumed from its checkpoint, which lists
+            # the spooled URLs as unfinished, so the pending batch is dropped
+            if exc_type is None:
+                self.flush()
+        finally:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+            shutil.rmtree(self.incoming_dir, ignore_errors=True)
+            if self.cache is not None:
+                self.cache.close()
+
+    def add(self, url, body, suffix=".html"):
+        name = self._claim(url, hashlib.sha256(body).hexdigest(), suffix)
+        if name:
+            with metrics.timer("spool_write", self.trace, bytes=len(body)), \
+                    open(os.path.join(self.spool_dir, name), "wb") as f:
+                f.write(body)
+            self._spooled(len(body))
+
+    # Streamed bodies: receive() writes chunks to a private file from any fetch
+    # thread, and add_file() later moves it into the batch on the script thread.
+    def receive(self, chunks):
+        digest, size = hashlib.sha256(), 0
+        fd, path = tempfile.mkstemp(dir=self.incoming_dir)
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        return path, digest.hexdigest(), size
+
+    def add_file(self, url, path, digest, size, suffix=".txt"):
+        name = self._claim(url, digest, suffix)
+        if name:
+            os.replace(path, os.path.join(self.spool_dir, name))
+            self._spooled(size)
+        else:
+            os.remove(path)
+
+    def _claim(self, url, digest, suffix):
+        self.bodies += 1
+        if digest in self.urls:
+            self.reused += 1
+            self.urls[digest].append(url)
+            return None
+        if self.cache is not None:
+            cached = self.cache.get(digest)
+            if cached is not None:
+                self.reused += 1
+                self.emit(cached, url)
+                return None
+        self.counter += 1
+        name = f"{self.counter:06d}{suffix}"
+        self.sources[name] = digest
+        self.urls[digest] = [url]
+        return name
+
+    def _spooled(self, size):
+        self.spooled_bytes += size
+        if len(self.sources) >= self.max_files or self.spooled_bytes >= self.max_bytes:
+            self.flush()
+
+    def pending_urls(self):
+        return [url for urls in self.urls.values() for url in urls]
+
+    def cache_summary(self):
+        rate = self.reused / self.bodies if self.bodies else 0.0
+        return f"Scan cache: {self.reused} of {self.bodies} page bodies reused without rescanning ({rate:.0%} hit rate)"
+
+    def _digest_of(self, record):
+        fs_meta = ((record.get("SourceMetadata") or {}).get("Data") or {}).get("Filesystem") or {}
+        return self.sources.get(os.path.basename(fs_meta.get("file", "")))
+
+    def _attribute(self, record):
+        digest = self._digest_of(record)
+        if digest:
+            record["SourceURL"] = self.urls[digest][0]
+
+    def _store(self, records):
+        self.findings += len(records)
+        metrics.incr("findings", len(records), self.trace)
+        if self.scan_id is not None:
+            with metrics.timer("store", self.trace, findings=len(records)):
+                for record in records:
+                    findings_store.add(self.scan_id, record)
+                findings_store.commit()
+
+    def emit(self, findings, url):
+        emitted = [dict(finding, SourceURL=url) for finding in findings]
+        if emitted and self.out_file_path:
+            with open(self.out_file_path, "a") as out_f:
+                for record in emitted:
+                    out_f.write(json.dumps(record) + "\n")
+        self._store(emitted)
+
+    def flush(self):
+        if not self.sources:
+            return []
+        cmd = [
+            "trufflehog", "filesystem", self.spool_dir,
+            "--results=verified,unknown", "--json", "--no-update"
+        ]
+        run_stats = {}
+        with metrics.timer("scan_batch", self.trace, files=len(self.sources), bytes=self.spooled_bytes):
+            found = run_trufflehog(
+                cmd, self.out_file_path, annotate=self._attribute, run_stats=run_stats, trace=self.trace
+            )
+        self._store(found)
+        by_digest = {digest: [] for digest in self.sources.values()}
+        for record in found:
+            digest = self._digest_of(record)
+            if digest:
+                by_digest[digest].append({k: v for k, v in record.items() if k != "SourceURL"})
+        complete = run_stats.get("returncode") == 0 and not run_stats.get("timed_out")
+        self.complete = self.complete and complete
+        for digest, findings in by_digest.items():
+            for url in self.urls[digest][1:]:
+                self.emit(findings, url)
+            if complete and self.cache is not None:
+                self.cache.put(digest, findings)
+        if self.cache is not None:
+            self.cache.evict()
+        for name in self.sources:
+            os.remove(os.path.join(self.spool_dir, name))
+        self.sources.clear()
+        self.urls.clear()
+        self.spooled_bytes = 0
+        return found
+
+# Shared HTTP session with a keep-alive connection pool sized to the fetch workers
+CRAWL_WORKERS = 16
+
+def make_session(pool_size=CRAWL_WORKERS):
+    import requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# Adaptive per-host rate control shared by all page fetching. Each host has a
+# token bucket (requests per second) and an AIMD concurrency limit: healthy
+# responses raise both (doubling-style until the first throttle, additively
+# after), while 429/503 responses halve them at most once per round trip and
+# block the host until any Retry-After has passed. Throttled requests are
+# retried once the host admits them again instead of failing. The first
+# attempt's timeout tracks the latency of the host's successful responses; a
+# timed-out fetch counts as an error, not a throttle, and is retried once with
+# the full timeout, so a slow page is still fetched and a stalled host costs
+# at most two timeouts per fetch.
+RATE_INITIAL_CONCURRENCY = 4
+RATE_MAX_CONCURRENCY = CRAWL_WORKERS
+RATE_INITIAL_RPS = 10.0
+RATE_MIN_RPS = 0.2
+RATE_MAX_RPS = 500.0
+RATE_RPS_INCREASE = 0.1
+RATE_MAX_RETRIES = 4
+RATE_MAX_TIMEOUT_RETRIES = 1
+RATE_MAX_BACKOFF = 120
+RATE_MIN_TIMEOUT = 2.0
+RATE_WINDOW = 10
+THROTTLE_STATUSES = {429, 503}
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        parsed = email.utils.parsedate_tz(value)
+        if parsed is None:
+            return None
+        seconds = email.utils.mktime_tz(parsed) - time.time()
+    return min(max(seconds, 0), RATE_MAX_BACKOFF)
+
+class HostRateController:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.hosts = {}
+
+    def _host(self, host):
+        if host not in self.hosts:
+            now = time.monotonic()
+            self.hosts[host] = {
+                "host": host, "limit": float(RATE_INITIAL_CONCURRENCY), "rate": RATE_INITIAL_RPS,
+                "tokens": 1.0, "refilled": now, "in_flight": 0, "slow_start": True,
+                "blocked_until": 0.0, "decreased_at": 0.0, "latency": None,
+                "requests": 0, "throttled": 0, "errors": 0, "recent": deque()
+            }
+        return self.hosts[host]
+
+    def acquire(self, host, cancel_event=None):
+        with self.cond:
+            state = self._host(host)
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise CancelledError()
+                now = time.monotonic()
+                state["tokens"] = min(
+                    max(state["rate"], 1.0), state["tokens"] + (now - state["refilled"]) * state["rate"]
+                )
+                state["refilled"] = now
+                delay = max(state["blocked_until"] - now, 0)
+                if not delay and state["in_flight"] < int(state["limit"]):
+                    if state["tokens"] >= 1:
+                        state["tokens"] -= 1
+                        state["in_flight"] += 1
+                        return state
+                    delay = (1 - state["tokens"]) / state["rate"]
+                self.cond.wait(delay or None)
+
+    def wake(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def timeout(self, state, base):
+        if state["latency"] is None:
+            return base
+        return min(base, max(RATE_MIN_TIMEOUT, 4 * state["latency"]))
+
+    def release(self, state, outcome, elapsed, nbytes=0, retry_after=None):
+        with self.cond:
+            now = time.monotonic()
+            state["in_flight"] -= 1
+            if outcome == "ok":
+                latency = state["latency"]
+                state["latency"] = elapsed if latency is None else 0.8 * latency + 0.2 * elapsed
+                state["requests"] += 1
+                state["recent"].append((now, nbytes))
+                if state["slow_start"]:
+                    state["limit"] = min(state["limit"] + 1, RATE_MAX_CONCURRENCY)
+                    state["rate"] = min(state["rate"] * 1.05, RATE_MAX_RPS)
+                else:
+                    state["limit"] = min(state["limit"] + 1 / state["limit"], RATE_MAX_CONCURRENCY)
+                    state["rate"] = min(state["rate"] + RATE_RPS_INCREASE, RATE_MAX_RPS)
+            elif outcome == "throttled":
+                state["throttled"] += 1
+                state["slow_start"] = False
+                # Only one decrease per round trip, so a burst of throttled
+                # responses to requests already in flight counts once
+                if now - state["decreased_at"] >= max(state["latency"] or 0, 0.5):
+                    state["limit"] = max(state["limit"] / 2, 1.0)
+                    state["rate"] = max(state["rate"] / 2, RATE_MIN_RPS)
+                    state["decreased_at"] = now
+                if retry_after:
+                    state["blocked_until"] = max(state["blocked_until"], now + retry_after)
+            else:
+                state["errors"] += 1
+            self.cond.notify_all()
+
+    def table(self, hosts=None):
+        import pandas as pd
+        rows = []
+        with self.cond:
+            now = time.monotonic()
+            for host, state in self.hosts.items():
+                if hosts is not None and host not in hosts:
+                    continue
+                recent = state["recent"]
+                while recent and now - recent[0][0] > RATE_WINDOW:
+                    recent.popleft()
+                rows.append({
+                    "Host": host,
+                    "Req/s": round(len(recent) / RATE_WINDOW, 1),
+                    "MB/s": round(sum(n for _, n in recent) / RATE_WINDOW / 1e6, 2),
+                    "Requests": state["requests"],
+                    "Throttled": state["throttled"],
+                    "Errors": state["errors"],
+                    "Concurrency": int(state["limit"]),
+                    "Rate limit (req/s)": round(state["rate"], 1),
+                    "Backoff (s)": round(max(state["blocked_until"] - now, 0), 1)
+                })
+        return pd.DataFrame(rows)
+
+@st.cache_resource
+def get_rate_controller():
+    return HostRateController()
+
+rate_controller = get_rate_controller()
+
+# Fetch pool for crawls and brute-force scans. When the scan is interrupted
+# (Cancel reruns the script), queued fetches are dropped and fetches waiting
+# in acquire() for a throttled host give up instead of running to completion.
+@contextmanager
+def fetch_pool(workers):
+    cancel_event = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        yield pool, cancel_event
+    except BaseException:
+        cancel_event.set()
+        rate_controller.wake()
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        pool.shutdown()
+
+def fetch_page(session, url, timeout=5, headers=None, stream=False, cancel_event=None, trace=None):
+    import requests
+    host = urlparse(url).netloc
+    timeouts = 0
+    for attempt in range(RATE_MAX_RETRIES + 1):
+        state = rate_controller.acquire(host, cancel_event)
+        started = time.monotonic()
+        try:
+            resp = session.get(
+                url, timeout=timeout if timeouts else rate_controller.timeout(state, timeout),
+                headers=headers, stream=stream
+            )
+        except requests.Timeout:
+            rate_controller.release(state, "error", time.monotonic() - started)
+            metrics.observe("fetch", time.monotonic() - started, trace, url=url, status="timeout")
+            timeouts += 1
+            if timeouts > RATE_MAX_TIMEOUT_RETRIES or attempt == RATE_MAX_RETRIES:
+                raise
+            continue
+        except Exception:
+            rate_controller.release(state, "error", time.monotonic() - started)
+            metrics.observe("fetch", time.monotonic() - started, trace, url=url, status="error")
+            raise
+        elapsed = time.monotonic() - started
+        nbytes = 0 if stream else len(resp.content)
+        metrics.observe("fetch", elapsed, trace, url=url, status=resp.status_code, bytes=nbytes)
+        metrics.incr("pages_fetched", trace=trace)
+        metrics.incr("bytes_fetched", nbytes, trace)
+        if resp.status_code in THROTTLE_STATUSES:
+            rate_controller.release(state, "throttled", elapsed, retry_after=parse_retry_after(
+                resp.headers.get("Retry-After")
+            ))
+            if attempt < RATE_MAX_RETRIES:
+                resp.close()
                 continue
-        return records
+        else:
+            rate_controller.release(state, "ok", elapsed, nbytes)
+        resp.raise_for_status()
+        return resp
+
+# Asset-aware crawling: scripts, preloaded/linked assets and .js/.json/.map
+# files referenced from pages or other assets are fetched alongside pages.
+# Assets are streamed to the scan spool in chunks with a per-asset byte cap,
+# so large bundles never sit in memory whole; references to further assets
+# (including sourceMappingURL comments and SourceMap headers) are picked out
+# of each chunk as it passes, and non-text content types are skipped.
+ASSET_EXTENSIONS = (".js", ".mjs", ".json", ".map")
+ASSET_LINK_RELS = {"preload", "modulepreload", "prefetch", "manifest"}
+ASSET_MAX_COUNT = 200
+ASSET_MAX_BYTES = 5 * 1024 * 1024
+ASSET_CHUNK_BYTES = 64 * 1024
+ASSET_REF_RE = re.compile(rb"""["'`(]([^"'`()\s<>]{1,512}?\.(?:m?js|json|map))(?:\?[^"'`()\s<>]*)?["'`)]""")
+SOURCE_MAP_RE = re.compile(rb"sourceMappingURL=([^\s'\"*]+)")
+
+def asset_type_allowed(content_type):
+    ctype = content_type.split(";")[0].strip().lower()
+    return (not ctype or ctype.startswith("text/") or "javascript" in ctype or "json" in ctype
+            or ctype == "application/octet-stream")
+
+def find_asset_refs(base_url, data):
+    refs = []
+    for pattern in (ASSET_REF_RE, SOURCE_MAP_RE):
+        for match in pattern.finditer(data):
+            ref = match.group(1).decode("utf-8", errors="replace")
+            if not ref.startswith("data:"):
+                refs.append(urldefrag(urljoin(base_url, ref))[0])
+    return refs
+
+# Link extraction works on the raw response bytes. lxml's C parser is used
+# when installed, falling back to BeautifulSoup's pure-Python html.parser;
+# either way only anchor hrefs, script srcs and link tags are pulled out.
+@functools.lru_cache(maxsize=None)
+def lxml_html():
+    try:
+        import lxml.html
+    except ImportError:
+        return None
+    return lxml.html
+
+def parse_page(url, body):
+    html = lxml_html()
+    if html is not None:
+        try:
+            root = html.fromstring(body)
+        except (ValueError, html.etree.ParserError):
+            return [], []
+        hrefs = root.xpath("//a/@href")
+        srcs = root.xpath("//script/@src")
+        link_tags = [(tag.get("href"), tag.get("rel", "").split()) for tag in root.xpath("//link[@href]")]
+    else:
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(body, "html.parser")
+        hrefs = [tag["href"] for tag in soup.find_all("a", href=True)]
+        srcs = [tag["src"] for tag in soup.find_all("script", src=True)]
+        link_tags = [(tag["href"], tag.get("rel", [])) for tag in soup.find_all("link", href=True)]
+
+    links = list(dict.fromkeys(urldefrag(urljoin(url, href.strip()))[0] for href in hrefs))
+    refs = [urljoin(url, src.strip()) for src in srcs]
+    for href, rels in link_tags:
+        if {rel.lower() for rel in rels} & ASSET_LINK_RELS or urlparse(href).path.endswith(ASSET_EXTENSIONS):
+            refs.append(urljoin(url, href.strip()))
+    refs += find_asset_refs(url, body)
+    return links, list(dict.fromkeys(urldefrag(ref)[0] for ref in refs))
+
+def asset_suffix(url):
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    return ext if ext in ASSET_EXTENSIONS else ".txt"
+
+def fetch_asset(session, url, spool, max_bytes=ASSET_MAX_BYTES, headers=None, timeout=10, cancel_event=None,
+                trace=None):
+    with fetch_page(session, url, timeout, headers, stream=True, cancel_event=cancel_event, trace=trace) as resp:
+        asset = {
+            "etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified"),
+            "path": None, "digest": None, "size": 0, "refs": [], "truncated": False
+        }
+        if resp.status_code == 304:
+            return asset
+        if not asset_type_allowed(resp.headers.get("Content-Type", "")):
+            return None
+        source_map = resp.headers.get("SourceMap") or resp.headers.get("X-SourceMap")
+        refs = [urljoin(url, source_map)] if source_map else []
+
+        def chunks():
+            read, carry = 0, b""
+            for chunk in resp.iter_content(ASSET_CHUNK_BYTES):
+                chunk = chunk[:max_bytes - read]
+                read += len(chunk)
+                refs.extend(find_asset_refs(url, carry + chunk))
+                carry = chunk[-512:]
+                yield chunk
+                if read >= max_bytes:
+                    asset["truncated"] = True
+                    break
+
+        with metrics.timer("asset_stream", trace, url=url) as span:
+            asset["path"], asset["digest"], asset["size"] = spool.receive(chunks())
+            span["bytes"] = asset["size"]
+        metrics.incr("bytes_fetched", asset["size"], trace)
+        asset["refs"] = list(dict.fromkeys(refs))
+        return asset
+
+def show_host_rates(area, hosts):
+    table = rate_controller.table(hosts)
+    if not table.empty:
+        area.dataframe(table, use_container_width=True, hide_index=True)
+
+# Per-site page index for incremental re-crawls: remembers each page's
+# validators (ETag / Last-Modified), body digest, outgoing links and findings
+# from the previous crawl, so unchanged pages can be skipped with a
+# conditional GET and their findings re-emitted without rescanning.
+SITE_INDEX_PATH = os.path.join(STATE_DIR, "site_index.db")
+
+class SiteIndex:
+    def __init__(self, site, path=SITE_INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.site = site
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS site_pages ("
+            "site TEXT NOT NULL, url TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+            "digest TEXT, links TEXT NOT NULL, findings TEXT NOT NULL, crawled_at REAL NOT NULL, "
+            "PRIMARY KEY (site, url))"
+        )
+        # Indexes written before asset-aware crawling have no assets column
+        if "assets" not in {row[1] for row in self.conn.execute("PRAGMA table_info(site_pages)")}:
+            self.conn.execute("ALTER TABLE site_pages ADD COLUMN assets TEXT NOT NULL DEFAULT '[]'")
+
+    def pages(self):
+        rows = self.conn.execute(
+            "SELECT url, etag, last_modified, digest, links, findings, assets FROM site_pages WHERE site = ?",
+            (self.site,)
+        )
+        return {
+            url: {
+                "etag": etag, "last_modified": last_modified, "digest": digest,
+                "links": json.loads(links), "findings": json.loads(findings), "assets": json.loads(assets)
+            }
+            for url, etag, last_modified, digest, links, findings, assets in rows
+        }
+
+    def replace(self, pages):
+        now = time.time()
+        with self.conn:
+            self.conn.execute("DELETE FROM site_pages WHERE site = ?", (self.site,))
+            self.conn.executemany(
+                "INSERT INTO site_pages (site, url, etag, last_modified, digest, links, findings, crawled_at, "
+                "assets) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (self.site, url, e["etag"], e["last_modified"], e["digest"],
+                     json.dumps(e["links"]), json.dumps(e["findings"]), now, json.dumps(e.get("assets", [])))
+                    for url, e in pages.items()
+                ]
+            )
+
+    def close(self):
+        self.conn.close()
+
+def conditional_headers(entry):
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers or None
+
+def show_crawl_diff(previous, crawled, unchanged):
+    import pandas as pd
+    prev_keys = {finding_fingerprint(f): (url, f) for url, e in previous.items() for f in e["findings"]}
+    cur_keys = {finding_fingerprint(f) for e in crawled.values() for f in e["findings"]}
+    removed = [prev_keys[k] for k in prev_keys if k not in cur_keys]
+    st.markdown(
+        f"**Incremental crawl:** {len(crawled) - len(unchanged)} pages new or changed, "
+        f"{len(unchanged)} unchanged since the previous crawl of this site."
+    )
+    c1, c2, c3 = st.columns(3)
+    c1.metric("New secrets", len(cur_keys - set(prev_keys)))
+    c2.metric("Unchanged secrets", len(cur_keys & set(prev_keys)))
+    c3.metric("Removed secrets", len(removed))
+    if removed:
+        with st.expander("Secrets no longer found"):
+            st.dataframe(pd.DataFrame([{
+                'SourceURL': url,
+                'DetectorName': f.get('DetectorName', ''),
+                'Raw': (f.get('Raw', '')[:20] + '...') if f.get('Raw') else ''
+            } for url, f in removed]), use_container_width=True)
+
+# Crash-safe checkpoints for crawls and brute-force runs. Progress is written
+# atomically next to the scan's JSONL output every CHECKPOINT_INTERVAL
+# seconds, so a rerun, closed tab or session timeout loses at most that much
+# work. The scan batch is flushed before each checkpoint; URLs still in
+# flight (or, after an interrupted flush, in the batch) are saved as
+# unfinished, and everything else is done and not fetched again on resume.
+DOWNLOADS_DIR = "/home/kasm-user/Desktop/Downloads"
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+CHECKPOINT_INTERVAL = 10
+
+def save_checkpoint(output_path, state):
+    path = output_path + CHECKPOINT_SUFFIX
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".part", "w") as f:
+        json.dump(dict(state, saved_at=time.time()), f)
+    os.replace(path + ".part", path)
+
+def clear_checkpoint(output_path):
+    try:
+        os.remove(output_path + CHECKPOINT_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+def list_checkpoints(kind, directory=DOWNLOADS_DIR):
+    checkpoints = []
+    names = os.listdir(directory) if os.path.isdir(directory) else []
+    for name in sorted(names, reverse=True):
+        if not name.endswith(CHECKPOINT_SUFFIX):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if checkpoint.get("kind") == kind:
+            checkpoints.append(checkpoint)
+    return checkpoints
+
+def resume_picker(kind):
+    checkpoints = list_checkpoints(kind)
+    if not checkpoints:
+        return None
+    with st.expander(f"Resume an interrupted scan ({len(checkpoints)} saved)"):
+        labels = [
+            f"{c['target']} · {c['progress']} · saved {datetime.fromtimestamp(c['saved_at']):%Y-%m-%d %H:%M}"
+            for c in checkpoints
+        ]
+        choice = st.selectbox("Checkpoint:", range(len(checkpoints)), format_func=labels.__getitem__,
+                              key=f"resume_{kind}")
+        if st.button("Resume scan", key=f"resume_button_{kind}"):
+            st.session_state["scan_id"] = checkpoints[choice]["scan_id"]
+            return checkpoints[choice]
+    return None
+
+# Registered-domain lookups repeat for every link to the same host, so they
+# are memoized per host rather than run through tldextract per URL. tldextract
+# never goes to the network here: it reads the public suffix list baked into
+# the image (PSL_PATH), or its own bundled snapshot when that is missing, and
+# keeps the parsed list in TLD_CACHE_DIR, which the image build pre-warms.
+PSL_PATH = os.environ.get("TRUFFLEHOG_PSL_PATH", "/app/public_suffix_list.dat")
+TLD_CACHE_DIR = os.environ.get("TRUFFLEHOG_TLD_CACHE_DIR", os.path.join(STATE_DIR, "tldextract"))
+
+@functools.lru_cache(maxsize=None)
+def tld_extractor():
+    import tldextract
+    return tldextract.TLDExtract(
+        cache_dir=TLD_CACHE_DIR, fallback_to_snapshot=True,
+        suffix_list_urls=(f"file://{PSL_PATH}",) if os.path.exists(PSL_PATH) else ()
+    )
+
+@functools.lru_cache(maxsize=4096)
+def registered_domain(host):
+    return tld_extractor()(host).registered_domain
 
 # Crawl-and-scan helper that streams results to file
-def crawl_and_scan(start_url, max_pages, scope, out_file_path):
-    seen, queue, all_results = set(), [start_url], []
+def crawl_and_scan(start_url, max_pages, scope, out_file_path, scan_id=None, workers=CRAWL_WORKERS,
+                   use_cache=True, incremental=False, max_assets=ASSET_MAX_COUNT, asset_max_bytes=ASSET_MAX_BYTES,
+                   resume=None, trace=None):
+    params = {
+        "start_url": start_url, "max_pages": max_pages, "scope": scope, "out_file_path": out_file_path,
+        "scan_id": scan_id, "use_cache": use_cache, "incremental": incremental,
+        "max_assets": max_assets, "asset_max_bytes": asset_max_bytes
+    }
     parsed = urlparse(start_url)
     host = parsed.netloc.split(':')[0]
-    parts = host.split('.')
-    root_domain = '.'.join(parts[-2:]) if len(parts) >= 2 else host
+    root_domain = (registered_domain(host) or host) if scope == "Root Domain" else None
 
-    while queue and len(seen) < max_pages:
-        url = queue.pop(0)
-        if url in seen:
-            continue
-        seen.add(url)
-        try:
-            resp = requests.get(url, timeout=5)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
-            for a in soup.find_all('a', href=True):
-                link = urljoin(url, a['href'])
-                nl = urlparse(link).netloc.split(':')[0]
-                if scope == "Root Domain" and tldextract.extract(link).registered_domain != root_domain:
-                    continue
-                if scope == "Exact Host" and nl != host:
-                    continue
-                if link not in seen:
-                    queue.append(link)
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.html')
-            tmp.write(resp.text.encode()); tmp.flush()
+    def in_scope(link):
+        link_parsed = urlparse(link)
+        if link_parsed.scheme not in ("http", "https"):
+            return False
+        if scope == "Root Domain":
+            return registered_domain(link_parsed.netloc.split(':')[0]) == root_domain
+        if scope == "Exact Host":
+            return link_parsed.netloc.split(':')[0] == host
+        return True
+
+    index = SiteIndex(f"{scope}|{start_url}") if incremental else None
+    previous = index.pages() if index else {}
+
+    # URLs are marked seen when enqueued, so each one is fetched at most once
+    # and the seen sets double as the max_pages and max_assets budgets.
+    if resume:
+        crawled, unchanged, carried = resume["crawled"], set(resume["unchanged"]), set(resume["carried"])
+        seen, frontier = set(resume["seen"]), deque(resume["frontier"])
+        assets_seen, asset_frontier = set(resume["assets_seen"]), deque(resume["asset_frontier"])
+        asset_stats = resume["asset_stats"]
+    else:
+        crawled, unchanged, carried = {}, set(), set()
+        seen, frontier = {start_url}, deque([start_url])
+        assets_seen, asset_frontier = set(), deque()
+        asset_stats = {"fetched": 0, "bytes": 0, "skipped": 0, "truncated": 0}
+    pending = {}
+    hosts, rates_area, rates_shown, checkpointed = set(), st.empty(), 0, time.monotonic()
+
+    def checkpoint():
+        unfinished = [url for url, _ in pending.values()] + spool.pending_urls()
+        unfinished_set = set(unfinished)
+        retry_pages = [url for url in unfinished if url not in assets_seen]
+        retry_assets = [url for url in unfinished if url in assets_seen]
+        done = {url: entry for url, entry in crawled.items() if url not in unfinished_set}
+        save_checkpoint(out_file_path, {
+            "kind": "crawl", "scan_id": scan_id, "target": start_url, "params": params,
+            "progress": f"{len(done)} URLs done, {len(frontier) + len(retry_pages)} pages queued",
+            "crawled": done, "unchanged": sorted(unchanged), "carried": sorted(carried),
+            "seen": sorted(seen), "frontier": retry_pages + list(frontier),
+            "assets_seen": sorted(assets_seen), "asset_frontier": retry_assets + list(asset_frontier),
+            "asset_stats": asset_stats
+        })
+
+    def queue_assets(refs):
+        for ref in refs:
+            if len(assets_seen) >= max_assets:
+                break
+            if ref in assets_seen or ref in seen or not in_scope(ref):
+                continue
+            assets_seen.add(ref)
+            asset_frontier.append(ref)
+
+    with make_session(workers) as session, \
+            ScanSpool(out_file_path, scan_id, use_cache=use_cache, trace=trace) as spool, \
+            fetch_pool(workers) as (pool, cancel_event):
+        while frontier or asset_frontier or pending:
+            while (frontier or asset_frontier) and len(pending) < workers:
+                kind = "page" if frontier else "asset"
+                url = (frontier if frontier else asset_frontier).popleft()
+                hosts.add(urlparse(url).netloc)
+                headers = conditional_headers(previous.get(url))
+                if kind == "page":
+                    pending[pool.submit(
+                        fetch_page, session, url, 5, headers, cancel_event=cancel_event, trace=trace
+                    )] = (url, kind)
+                else:
+                    pending[pool.submit(
+                        fetch_asset, session, url, spool, asset_max_bytes, headers,
+                        cancel_event=cancel_event, trace=trace
+                    )] = (url, kind)
+            done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+            if time.monotonic() - rates_shown >= 1:
+                show_host_rates(rates_area, hosts)
+                render_metrics()
+                rates_shown = time.monotonic()
+            if time.monotonic() - checkpointed >= CHECKPOINT_INTERVAL:
+                spool.flush()
+                checkpoint()
+                checkpointed = time.monotonic()
+            for fut in done:
+                url, kind = pending.pop(fut)
+                entry = previous.get(url)
+                try:
+                    if kind == "asset":
+                        asset = fut.result()
+                        if asset is None:
+                            asset_stats["skipped"] += 1
+                            continue
+                        asset_stats["fetched"] += 1
+                        asset_stats["bytes"] += asset["size"]
+                        asset_stats["truncated"] += asset["truncated"]
+                        if entry and (asset["digest"] is None or asset["digest"] == entry["digest"]):
+                            if asset["path"]:
+                                os.remove(asset["path"])
+                            spool.emit(entry["findings"], url)
+                            unchanged.add(url)
+                            crawled[url] = dict(entry)
+                            queue_assets(entry.get("assets", []))
+                        else:
+                            spool.add_file(url, asset["path"], asset["digest"], asset["size"], asset_suffix(url))
+                            crawled[url] = {
+                                "etag": asset["etag"],
+                                "last_modified": asset["last_modified"],
+                                "digest": asset["digest"],
+                                "links": [],
+                                "assets": asset["refs"]
+                            }
+                            queue_assets(asset["refs"])
+                        continue
+                    resp = fut.result()
+                    body = resp.content if resp.status_code != 304 else None
+                    digest = hashlib.sha256(body).hexdigest() if body is not None else None
+                    if entry and (body is None or digest == entry["digest"]):
+                        # Unchanged since the last crawl: reuse its links and findings
+                        links = entry["links"]
+                        spool.emit(entry["findings"], url)
+                        unchanged.add(url)
+                        crawled[url] = dict(entry)
+                        queue_assets(entry.get("assets", []))
+                    else:
+                        with metrics.timer("parse", trace, url=url):
+                            links, assets = parse_page(url, body)
+                        spool.add(url, body)
+                        crawled[url] = {
+                            "etag": resp.headers.get("ETag"),
+                            "last_modified": resp.headers.get("Last-Modified"),
+                            "digest": digest,
+                            "links": links,
+                            "assets": assets
+                        }
+                        queue_assets(assets)
+                    for link in links:
+                        if len(seen) >= max_pages:
+                            break
+                        if link in seen or not in_scope(link):
+                            continue
+                        seen.add(link)
+                        frontier.append(link)
+                except Exception as e:
+                    if entry:
+                        crawled[url] = dict(entry)
+                        carried.add(url)
+                    st.warning(f"Failed to fetch {url}: {e}")
+    show_host_rates(rates_area, hosts)
+    if max_assets:
+        st.caption(
+            f"Assets: {asset_stats['fetched']} fetched ({asset_stats['bytes'] / 1e6:.1f} MB), "
+            f"{asset_stats['truncated']} cut at the {asset_max_bytes / 1e6:.0f} MB cap, "
+            f"{asset_stats['skipped']} skipped by content type"
+        )
+    st.caption(spool.cache_summary())
+
+    if index is not None:
+        findings_by_url = {}
+        for record in (findings_store.records(scan_id) if scan_id is not None else []):
+            findings_by_url.setdefault(record.get("SourceURL"), []).append(
+                {k: v for k, v in record.items() if k != "SourceURL"}
+            )
+        for url, entry in crawled.items():
+            if url not in carried:
+                entry["findings"] = findings_by_url.get(url, [])
+        index.replace(crawled)
+        index.close()
+        show_crawl_diff(previous, crawled, unchanged)
+    clear_checkpoint(out_file_path)
+    if scan_id is not None:
+        findings_store.finish_scan(scan_id, "complete" if spool.complete else "incomplete")
+    return spool.findings
+
+# Wordlist store for Directory Brute-Force. Lists are seeded into WORDLIST_DIR
+# at image build time and verified against its SHA256SUMS file before use;
+# bundled lists are only downloaded again when missing, corrupted, or when a
+# refresh is requested, so scans work in offline sessions.
+WORDLIST_DIR = os.environ.get("TRUFFLEHOG_WORDLIST_DIR", "/app/wordlists")
+SECLISTS_URL = "https://raw.githubusercontent.com/danielmiessler/SecLists/master/Discovery/Web-Content/"
+BUNDLED_WORDLISTS = {
+    "raft-small-directories.txt": "Small",
+    "raft-medium-directories.txt": "Medium",
+    "raft-large-directories.txt": "Large",
+}
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_wordlist_sums():
+    sums = {}
+    sums_path = os.path.join(WORDLIST_DIR, "SHA256SUMS")
+    if os.path.exists(sums_path):
+        with open(sums_path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2:
+                    sums[parts[1].lstrip("*")] = parts[0]
+    return sums
+
+def store_wordlist(name, data):
+    os.makedirs(WORDLIST_DIR, exist_ok=True)
+    path = os.path.join(WORDLIST_DIR, name)
+    with open(path + ".part", "wb") as f:
+        f.write(data)
+    os.replace(path + ".part", path)
+    sums = read_wordlist_sums()
+    sums[name] = hashlib.sha256(data).hexdigest()
+    sums_path = os.path.join(WORDLIST_DIR, "SHA256SUMS")
+    with open(sums_path + ".part", "w") as f:
+        for entry in sorted(sums):
+            f.write(f"{sums[entry]}  {entry}\n")
+    os.replace(sums_path + ".part", sums_path)
+    return path
+
+def get_wordlist(name, refresh=False):
+    path = os.path.join(WORDLIST_DIR, name)
+    refresh = refresh and name in BUNDLED_WORDLISTS
+    if not refresh and os.path.exists(path) and read_wordlist_sums().get(name) == file_sha256(path):
+        return path
+    if name not in BUNDLED_WORDLISTS:
+        raise ValueError(f"Wordlist {name} is missing or fails its checksum; upload it again.")
+    import requests
+    resp = requests.get(SECLISTS_URL + name, timeout=60); resp.raise_for_status()
+    return store_wordlist(name, resp.content)
+
+def list_wordlists():
+    custom = sorted(n for n in read_wordlist_sums() if n not in BUNDLED_WORDLISTS)
+    return list(BUNDLED_WORDLISTS) + custom
+
+def merge_wordlists(paths):
+    if len(paths) == 1:
+        return paths[0]
+    key = hashlib.sha256("\n".join(file_sha256(p) for p in paths).encode()).hexdigest()[:16]
+    merged_dir = os.path.join(WORDLIST_DIR, "merged")
+    merged_path = os.path.join(merged_dir, f"merged_{key}.txt")
+    if not os.path.exists(merged_path):
+        os.makedirs(merged_dir, exist_ok=True)
+        seen = set()
+        with open(merged_path + ".part", "w") as out:
+            for p in paths:
+                with open(p, errors="replace") as f:
+                    for line in f:
+                        word = line.strip()
+                        if word and not word.startswith("#") and word not in seen:
+                            seen.add(word)
+                            out.write(word + "\n")
+        os.replace(merged_path + ".part", merged_path)
+    return merged_path
+
+# Directory brute-force runner. The wordlist is fed to gobuster in chunks so
+# the checkpoint can record a cursor of words fully tried, and each path
+# gobuster prints is fetched straight away on the pool and spooled for
+# TruffleHog, so discovery, fetching and scanning overlap.
+DIRBF_CHUNK_WORDS = 5000
+
+def iter_word_chunks(wordlist_path, start, size):
+    chunk = []
+    with open(wordlist_path, errors="replace") as f:
+        for number, line in enumerate(f):
+            if number < start:
+                continue
+            chunk.append(line)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+def dirbust_and_scan(base_url, wordlist_path, threads, output_path, scan_id, gobuster_log_path,
+                     use_cache=True, resume=None, trace=None):
+    params = {
+        "base_url": base_url, "wordlist_path": wordlist_path, "threads": threads, "output_path": output_path,
+        "scan_id": scan_id, "gobuster_log_path": gobuster_log_path, "use_cache": use_cache
+    }
+    cursor = resume["cursor"] if resume else 0
+    found_paths = set(resume["found"]) if resume else set()
+    with open(wordlist_path, errors="replace") as f:
+        total_words = sum(1 for _ in f)
+    status, rates_area = st.empty(), st.empty()
+    rate_hosts = {urlparse(base_url).netloc}
+    pending, started, stopped = {}, time.monotonic(), False
+    chunk_dir = tempfile.mkdtemp(prefix="gobuster_chunks_")
+    chunk_path = os.path.join(chunk_dir, "words.txt")
+
+    def checkpoint():
+        unfinished = set(pending.values()) | set(spool.pending_urls())
+        save_checkpoint(output_path, {
+            "kind": "dirbf", "scan_id": scan_id, "target": base_url, "params": params,
+            "progress": f"{cursor} of {total_words} words tried, {len(found_paths)} paths found",
+            "cursor": cursor, "found": sorted(found_paths), "unfinished": sorted(unfinished)
+        })
+
+    with make_session() as session, ScanSpool(output_path, scan_id, use_cache=use_cache, trace=trace) as spool, \
+            fetch_pool(CRAWL_WORKERS) as (pool, cancel_event), open(gobuster_log_path, "a") as log_f:
+        checkpointed = time.monotonic()
+
+        def collect_fetches(futures):
+            for fut in futures:
+                full_url = pending.pop(fut)
+                try:
+                    spool.add(full_url, fut.result().content)
+                except Exception as e:
+                    st.warning(f"Failed to fetch {full_url}: {e}")
+
+        def on_gobuster_line(line):
+            line = line.strip()
+            if not line or line.startswith("===="):
+                return
+            log_f.write(line + "\n")
+            full_url = line.split()[0]
+            if full_url in found_paths:
+                return
+            found_paths.add(full_url)
+            pending[pool.submit(
+                fetch_page, session, full_url, 10, cancel_event=cancel_event, trace=trace
+            )] = full_url
+            collect_fetches([fut for fut in pending if fut.done()])
+
+        def on_gobuster_progress(stats):
+            nonlocal checkpointed
+            collect_fetches([fut for fut in pending if fut.done()])
+            status.caption(
+                f"Gobuster: words {cursor:,}–{cursor + len(chunk):,} of {total_words:,} · "
+                f"{format_progress(stats)} · {len(found_paths)} paths found · "
+                f"{len(found_paths) - len(pending)} fetched"
+            )
+            show_host_rates(rates_area, rate_hosts)
+            render_metrics()
+            if time.monotonic() - checkpointed >= CHECKPOINT_INTERVAL:
+                spool.flush()
+                checkpoint()
+                checkpointed = time.monotonic()
+
+        # Paths found before an interruption but never scanned are fetched again
+        for full_url in (resume["unfinished"] if resume else []):
+            pending[pool.submit(
+                fetch_page, session, full_url, 10, cancel_event=cancel_event, trace=trace
+            )] = full_url
+
+        for chunk in iter_word_chunks(wordlist_path, cursor, DIRBF_CHUNK_WORDS):
+            with open(chunk_path, "w") as f:
+                f.writelines(chunk)
+            # Run Gobuster with -q and the status blacklist disabled
             cmd = [
-                "trufflehog", "filesystem", tmp.name,
-                "--results=verified,unknown", "--json", "--no-update"
+                "gobuster", "dir",
+                "-u", base_url,
+                "-w", chunk_path,
+                "-t", str(threads),
+                "-e",
+                "-s", "200,204,301,302,307,401,403",
+                "-b", "",
+                "-q"
             ]
-            all_results.extend(run_trufflehog(cmd, out_file_path))
-        except Exception as e:
-            st.warning(f"Failed to fetch {url}: {e}")
-    return all_results
+            if cursor == (resume["cursor"] if resume else 0):
+                st.text(f"🔍 Running command (per {DIRBF_CHUNK_WORDS}-word chunk): {' '.join(cmd)}")
+            remaining = scan_timeout - (time.monotonic() - started) if scan_timeout else None
+            result = run_process(
+                cmd, on_gobuster_line, timeout=remaining, on_progress=on_gobuster_progress, trace=trace
+            )
+            if result["timed_out"]:
+                st.warning(
+                    f"Gobuster hit the {scan_timeout_min}-minute scan limit; scanning paths found so far. "
+                    "Resume the scan to try the remaining words."
+                )
+                stopped = True
+                break
+            if result["returncode"] != 0:
+                st.error(f"Gobuster error: {result['stderr'].strip()}")
+                stopped = True
+                break
+            cursor += len(chunk)
+            checkpoint()
+        # Drain the remaining fetches with regular UI updates, which is where
+        # a Cancel rerun can interrupt the scan
+        while pending:
+            collect_fetches(wait(pending, timeout=1)[0])
+            status.caption(f"Fetching {len(pending)} remaining paths")
+            show_host_rates(rates_area, rate_hosts)
+            render_metrics()
+        status.empty()
+        show_host_rates(rates_area, rate_hosts)
+        st.text(f"📄 Gobuster log saved to: {gobuster_log_path}")
+    shutil.rmtree(chunk_dir, ignore_errors=True)
+    if stopped:
+        checkpoint()
+    else:
+        clear_checkpoint(output_path)
+    if scan_id is not None:
+        findings_store.finish_scan(scan_id, "complete" if spool.complete and not stopped else "incomplete")
+    st.success(f"Found {len(found_paths)} paths")
+    st.caption(spool.cache_summary())
+    return found_paths
+
+# Startup timing: every script run's page setup (imports through the shared
+# helpers and sidebar) is shown in the metrics panel. The first run in a
+# server process is also appended to STARTUP_LOG, where the startup script
+# records how long the server took to report ready.
+STARTUP_LOG = os.path.join(STATE_DIR, "startup.jsonl")
+
+def log_startup(event, seconds):
+    os.makedirs(os.path.dirname(STARTUP_LOG), exist_ok=True)
+    with open(STARTUP_LOG, "a") as f:
+        f.write(json.dumps({"time": datetime.now().isoformat(timespec="seconds"), "event": event,
+                            "seconds": round(seconds, 3)}) + "\n")
+
+metrics.startup["page_setup"] = time.perf_counter() - script_started
+if "first_page_setup" not in metrics.startup:
+    metrics.startup["first_page_setup"] = metrics.startup["page_setup"]
+    log_startup("first_page_setup", metrics.startup["page_setup"])
 
 # Main logic
-records = None
 
 if scan_mode == "Website Scan":
     page_type_descriptions = {
@@ -139,12 +2029,30 @@ if scan_mode == "Website Scan":
             "saving each page’s HTML and scanning it."
         ),
         "Directory Brute-Force": (
-            "Uses Gobuster with the SecLists raft-small-directories wordlist to discover "
-            "common subfolders, then fetches each and scans them with TruffleHog."
+            "Uses Gobuster with the bundled SecLists raft wordlists (or your own) to discover "
+            "common subfolders, fetching and scanning each one with TruffleHog as it is found."
         )
     }
     page_mode = st.radio("Choose Scan Type:", list(page_type_descriptions.keys()), key="page_mode")
     st.markdown(f"**How this works:** {page_type_descriptions[page_mode]}")
+    # Website scans are not background jobs: their fetches run on a thread
+    # pool, but progress, host rates, warnings and the crawl diff are drawn
+    # from the script thread, so a rerun stops them. Crawls and brute-force
+    # runs rely on their checkpoints (see resume_picker) to survive that.
+    if page_mode == "Single Page":
+        st.info("Website scans run in this page, not as background jobs: clicking any control "
+                "while a scan runs stops it, and the page has to be scanned again.")
+    else:
+        st.info("Website scans run in this page, not as background jobs: clicking any control "
+                f"while a scan runs stops it. Progress is checkpointed every {CHECKPOINT_INTERVAL} "
+                "seconds; an interrupted scan can be continued from **Resume an interrupted scan**, "
+                "which appears below once a checkpoint is saved.")
+    use_scan_cache = st.checkbox(
+        "Reuse cached findings for identical page bodies", value=True,
+        help="Pages whose content was already scanned (in this or an earlier scan) are not rescanned. "
+             f"Cached results with findings are reused for {SCAN_CACHE_FINDINGS_TTL // 60} minutes so "
+             f"verification status stays current; results without findings for {SCAN_CACHE_TTL // 86400} days."
+    )
 
     # ────────── Single Page ──────────
     if page_mode == "Single Page":
@@ -152,15 +2060,21 @@ if scan_mode == "Website Scan":
         if st.button("Scan Website"):
             ts = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_single_{ts}.jsonl"
-            with st.spinner("Scanning single page..."):
-                resp = requests.get(url, timeout=10); resp.raise_for_status()
-                tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.html')
-                tmp.write(resp.text.encode()); tmp.flush()
-                cmd = [
-                    "trufflehog", "filesystem", tmp.name,
-                    "--results=verified,unknown", "--json", "--no-update"
-                ]
-                records = run_trufflehog(cmd, output_path)
+            with st.spinner("Scanning single page..."), ScanTrace(output_path + TRACE_SUFFIX) as trace, \
+                    make_session(1) as session:
+                # The scan is registered only once the page body is in hand, so
+                # an unreachable URL never shows up as an empty scan
+                try:
+                    resp = fetch_page(session, url, 10, trace=trace)
+                except Exception as e:
+                    resp = None
+                    st.error(f"Failed to fetch {url}: {e}")
+                if resp is not None:
+                    scan_id = start_scan(output_path, url)
+                    with ScanSpool(output_path, scan_id, use_cache=use_scan_cache, trace=trace) as spool:
+                        spool.add(url, resp.content)
+                    findings_store.finish_scan(scan_id, "complete" if spool.complete else "incomplete")
+                    st.caption(spool.cache_summary())
 
     # ────────── Crawl Entire Site ──────────
     elif page_mode == "Crawl Entire Site":
@@ -172,18 +2086,63 @@ if scan_mode == "Website Scan":
             "Exact Host": "Follows links whose host exactly matches the start URL (no subdomains)."
         }
         st.markdown(f"**Scope explanation:** {scope_desc[scope]}")
+        incremental = st.checkbox(
+            "Incremental re-crawl",
+            help="Uses conditional GETs against the previous crawl of this site; unchanged pages "
+                 "are not rescanned and the result lists new, unchanged and removed secrets."
+        )
+        a1, a2 = st.columns(2)
+        max_assets = a1.number_input(
+            "Max linked assets (JS / JSON / source maps) to fetch:", 0, 5000, ASSET_MAX_COUNT,
+            help="Scripts, preloads and .js/.json/.map files referenced by crawled pages; 0 scans HTML only."
+        )
+        asset_cap_mb = a2.number_input("Per-asset size cap (MB):", 1, 100, ASSET_MAX_BYTES // (1024 * 1024))
+        resume = resume_picker("crawl")
+        if resume:
+            with st.spinner(f"Resuming crawl of {resume['target']}..."), \
+                    ScanTrace(resume["params"]["out_file_path"] + TRACE_SUFFIX) as trace:
+                crawl_and_scan(**resume["params"], resume=resume, trace=trace)
         if st.button("Crawl and Scan"):
             ts = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_crawl_{ts}.jsonl"
-            with st.spinner(f"Crawling up to {max_pages} pages ({scope})..."):
+            scan_id = start_scan(output_path, raw_url)
+            with st.spinner(f"Crawling up to {max_pages} pages ({scope})..."), \
+                    ScanTrace(output_path + TRACE_SUFFIX) as trace:
                 parsed = urlparse(raw_url)
                 start_site = f"{parsed.scheme}://{parsed.netloc}"
-                records = crawl_and_scan(start_site, max_pages, scope, output_path)
+                crawl_and_scan(
+                    start_site, max_pages, scope, output_path, scan_id,
+                    use_cache=use_scan_cache, incremental=incremental,
+                    max_assets=max_assets, asset_max_bytes=asset_cap_mb * 1024 * 1024, trace=trace
+                )
 
     # ────────── Directory Brute-Force ──────────
     else:
         base_url = st.text_input("Enter base URL (e.g. https://example.com):", "https://example.com")
         threads = st.number_input("Gobuster threads:", 10, 100, 50)
+        uploaded_wl = st.file_uploader("Add a custom wordlist:", type=["txt"])
+        if uploaded_wl is not None:
+            custom_name = "custom-" + re.sub(r"[^A-Za-z0-9._-]", "_", uploaded_wl.name)
+            custom_data = uploaded_wl.getvalue()
+            # The upload persists across reruns; only a new or changed list is written
+            if read_wordlist_sums().get(custom_name) != hashlib.sha256(custom_data).hexdigest() or \
+                    not os.path.exists(os.path.join(WORDLIST_DIR, custom_name)):
+                store_wordlist(custom_name, custom_data)
+        wordlists = st.multiselect(
+            "Wordlists (merged and de-duplicated when several are chosen):",
+            list_wordlists(),
+            default=["raft-small-directories.txt"],
+            format_func=lambda n: f"{BUNDLED_WORDLISTS.get(n, 'Custom')} ({n})"
+        )
+        refresh_wl = st.checkbox("Refresh bundled wordlists from SecLists")
+        resume = resume_picker("dirbf")
+        if resume:
+            if not os.path.exists(resume["params"]["wordlist_path"]):
+                st.error("The wordlist this scan used is no longer available.")
+            else:
+                with st.spinner(f"Resuming brute-force of {resume['target']}..."), \
+                        ScanTrace(resume["params"]["output_path"] + TRACE_SUFFIX) as trace:
+                    dirbust_and_scan(**resume["params"], resume=resume, trace=trace)
         if st.button("Scan Directories"):
             ts = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_dirbf_{ts}.jsonl"
@@ -193,157 +2152,177 @@ if scan_mode == "Website Scan":
             )
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-            # Download wordlist
-            with st.spinner("Downloading wordlist..."):
-                wl_url = (
-                    "https://raw.githubusercontent.com/danielmiessler/"
-                    "SecLists/master/Discovery/Web-Content/raft-small-directories.txt"
-                )
-                wl_resp = requests.get(wl_url); wl_resp.raise_for_status()
-                tmp_wl = tempfile.NamedTemporaryFile(delete=False, suffix=".txt")
-                tmp_wl.write(wl_resp.content); tmp_wl.flush()
-
-            # Run Gobuster with -q, disable blacklist, and -o
-            with st.spinner("Running Gobuster..."):
-                cmd = [
-                    "gobuster", "dir",
-                    "-u", base_url,
-                    "-w", tmp_wl.name,
-                    "-t", str(threads),
-                    "-e",
-                    "-s", "200,204,301,302,307,401,403",
-                    "-b", "",
-                    "-q",
-                    "-o", gobuster_log_path
-                ]
-                st.text(f"🔍 Running command: {' '.join(cmd)}")
-                subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                st.text(f"📄 Gobuster log saved to: {gobuster_log_path}")
-
-            # Parse found URLs
-            found_paths = []
-            with open(gobuster_log_path) as gf:
-                for line in gf:
-                    line = line.strip()
-                    if not line or line.startswith("===="):
-                        continue
-                    url_candidate = line.split()[0]
-                    found_paths.append(url_candidate)
-            st.success(f"Found {len(found_paths)} paths")
-
-            # Fetch each and scan
-            records = []
-            for full_url in found_paths:
+            # Load wordlists from the local store
+            with st.spinner("Preparing wordlist..."):
+                if not wordlists:
+                    st.error("Choose at least one wordlist.")
+                    st.stop()
                 try:
-                    resp = requests.get(full_url, timeout=10); resp.raise_for_status()
-                    tmp_html = tempfile.NamedTemporaryFile(delete=False, suffix='.html')
-                    tmp_html.write(resp.text.encode()); tmp_html.flush()
-                    records.extend(run_trufflehog(
-                        ["trufflehog", "filesystem", tmp_html.name,
-                         "--results=verified,unknown", "--json", "--no-update"],
-                        output_path
-                    ))
+                    wordlist_path = merge_wordlists([get_wordlist(n, refresh_wl) for n in wordlists])
                 except Exception as e:
-                    st.warning(f"Failed to fetch {full_url}: {e}")
+                    st.error(f"Wordlist unavailable: {e}")
+                    st.stop()
+
+            # Registered only once the wordlist is ready, so an aborted start
+            # never shows up as an empty scan of the target
+            scan_id = start_scan(output_path, base_url)
+            with st.spinner("Running Gobuster and scanning discovered paths..."), \
+                    ScanTrace(output_path + TRACE_SUFFIX) as trace:
+                dirbust_and_scan(
+                    base_url, wordlist_path, threads, output_path, scan_id, gobuster_log_path,
+                    use_cache=use_scan_cache, trace=trace
+                )
 
 elif scan_mode == "Git Repository Scan":
-    repo = st.text_input("Enter Git Repo URL:", "https://github.com/user/repo.git")
-    if st.button("Scan Repository"):
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_gitrepo_{ts}.jsonl"
-        with st.spinner("Scanning repository..."):
+    if st.checkbox("Bulk mode: scan many repositories in parallel", key="bulk_git"):
+        repos = bulk_targets_input("Repository URLs", "bulk_git")
+        if st.button("Scan Repositories"):
+            if not repos:
+                st.error("Enter or upload at least one repository URL.")
+            else:
+                ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+                output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_gitbulk_{ts}.jsonl"
+                scan_id = start_scan(output_path, "\n".join(sorted(repos)))
+                submit_bulk_jobs([
+                    (repo, ["trufflehog", "git", repo, "--results=verified,unknown", "--json", "--no-update"])
+                    for repo in repos
+                ], output_path, scan_id)
+    else:
+        repo = st.text_input("Enter Git Repo URL:", "https://github.com/user/repo.git")
+        if st.button("Scan Repository"):
+            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_gitrepo_{ts}.jsonl"
+            scan_id = start_scan(output_path, repo)
             cmd = ["trufflehog", "git", repo, "--results=verified,unknown", "--json", "--no-update"]
-            records = run_trufflehog(cmd, output_path)
+            submit_scan_job(cmd, output_path, scan_id)
 
 elif scan_mode == "Local Git Repo Scan":
     path = st.text_input("Enter Local Path:", "file://./repo")
     if st.button("Scan Local Repo"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_localgit_{ts}.jsonl"
-        with st.spinner("Scanning local repo..."):
-            cmd = ["trufflehog", "git", path, "--results=verified,unknown", "--json", "--no-update"]
-            records = run_trufflehog(cmd, output_path)
+        scan_id = start_scan(output_path, path)
+        cmd = ["trufflehog", "git", path, "--results=verified,unknown", "--json", "--no-update"]
+        submit_scan_job(cmd, output_path, scan_id)
 
 elif scan_mode == "GitHub Org Scan":
     org = st.text_input("Enter GitHub Org:", "trufflesecurity")
     if st.button("Scan Org"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_githuborg_{ts}.jsonl"
-        with st.spinner("Scanning org..."):
-            cmd = ["trufflehog", "github", "--org", org, "--results=verified,unknown", "--json", "--no-update"]
-            records = run_trufflehog(cmd, output_path)
+        scan_id = start_scan(output_path, org)
+        cmd = ["trufflehog", "github", "--org", org, "--results=verified,unknown", "--json", "--no-update"]
+        submit_scan_job(cmd, output_path, scan_id)
 
 elif scan_mode == "GitHub Repo + Issues/PR Scan":
     repo = st.text_input("Enter GitHub Repo URL:", "https://github.com/user/repo.git")
     if st.button("Scan Issues/PRs"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_ghissues_{ts}.jsonl"
-        with st.spinner("Scanning issue/PR comments..."):
-            cmd = [
-                "trufflehog", "github", "--repo", repo,
-                "--issue-comments", "--pr-comments",
-                "--results=verified,unknown", "--json", "--no-update"
-            ]
-            records = run_trufflehog(cmd, output_path)
+        scan_id = start_scan(output_path, repo)
+        cmd = [
+            "trufflehog", "github", "--repo", repo,
+            "--issue-comments", "--pr-comments",
+            "--results=verified,unknown", "--json", "--no-update"
+        ]
+        submit_scan_job(cmd, output_path, scan_id)
 
 elif scan_mode == "GitHub Experimental Scan":
     repo = st.text_input("Enter Repo URL:", "https://github.com/user/repo.git")
     if st.button("Run Experimental Scan"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_ghexp_{ts}.jsonl"
-        with st.spinner("Running experimental scan..."):
-            cmd = [
-                "trufflehog", "github-experimental", "--repo", repo,
-                "--object-discovery", "--delete-cached-data",
-                "--results=verified,unknown", "--json", "--no-update"
-            ]
-            records = run_trufflehog(cmd, output_path)
+        scan_id = start_scan(output_path, repo)
+        cmd = [
+            "trufflehog", "github-experimental", "--repo", repo,
+            "--object-discovery", "--delete-cached-data",
+            "--results=verified,unknown", "--json", "--no-update"
+        ]
+        submit_scan_job(cmd, output_path, scan_id)
 
 elif scan_mode == "S3 Bucket Scan":
-    bucket = st.text_input("Enter S3 Bucket:", "my-bucket")
-    if st.button("Scan S3 Bucket"):
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_s3_{ts}.jsonl"
-        with st.spinner("Scanning S3 bucket..."):
+    if st.checkbox("Bulk mode: scan many buckets in parallel", key="bulk_s3"):
+        buckets = bulk_targets_input("Bucket names", "bulk_s3")
+        if st.button("Scan S3 Buckets"):
+            if not buckets:
+                st.error("Enter or upload at least one bucket name.")
+            else:
+                ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+                output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_s3bulk_{ts}.jsonl"
+                scan_id = start_scan(output_path, "\n".join(sorted(buckets)))
+                submit_bulk_jobs([
+                    (bucket, ["trufflehog", "s3", "--bucket", bucket, "--results=verified,unknown", "--json", "--no-update"])
+                    for bucket in buckets
+                ], output_path, scan_id)
+    else:
+        bucket = st.text_input("Enter S3 Bucket:", "my-bucket")
+        if st.button("Scan S3 Bucket"):
+            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_s3_{ts}.jsonl"
+            scan_id = start_scan(output_path, bucket)
             cmd = ["trufflehog", "s3", "--bucket", bucket, "--results=verified,unknown", "--json", "--no-update"]
-            records = run_trufflehog(cmd, output_path)
+            submit_scan_job(cmd, output_path, scan_id)
 
 elif scan_mode == "S3 Bucket with IAM Role":
     role = st.text_input("Enter IAM Role ARN:", "arn:aws:iam::123456789012:role/MyRole")
     if st.button("Scan S3 with Role"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_s3role_{ts}.jsonl"
-        with st.spinner("Scanning S3 with IAM role..."):
-            cmd = ["trufflehog", "s3", "--role-arn", role, "--results=verified,unknown", "--json", "--no-update"]
-            records = run_trufflehog(cmd, output_path)
+        scan_id = start_scan(output_path, role)
+        cmd = ["trufflehog", "s3", "--role-arn", role, "--results=verified,unknown", "--json", "--no-update"]
+        submit_scan_job(cmd, output_path, scan_id)
 
 elif scan_mode == "GCS Bucket Scan":
     pid = st.text_input("Enter GCP Project ID:", "my-project")
     if st.button("Scan GCS Bucket"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_gcs_{ts}.jsonl"
-        with st.spinner("Scanning GCS bucket..."):
-            cmd = ["trufflehog", "gcs", "--project-id", pid, "--cloud-environment", "--results=verified,unknown", "--json", "--no-update"]
-            records = run_trufflehog(cmd, output_path)
+        scan_id = start_scan(output_path, pid)
+        cmd = ["trufflehog", "gcs", "--project-id", pid, "--cloud-environment", "--results=verified,unknown", "--json", "--no-update"]
+        submit_scan_job(cmd, output_path, scan_id)
 
 elif scan_mode == "SSH Git Repo Scan":
     ssh_url = st.text_input("Enter SSH Git URL:", "git@github.com:user/repo.git")
     if st.button("Scan SSH Repo"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_ssh_{ts}.jsonl"
-        with st.spinner("Scanning SSH repo..."):
-            cmd = ["trufflehog", "git", ssh_url, "--results=verified,unknown", "--json", "--no-update"]
-            records = run_trufflehog(cmd, output_path)
+        scan_id = start_scan(output_path, ssh_url)
+        cmd = ["trufflehog", "git", ssh_url, "--results=verified,unknown", "--json", "--no-update"]
+        submit_scan_job(cmd, output_path, scan_id)
 
 elif scan_mode == "Filesystem Scan":
-    paths = st.text_input("Enter paths comma-separated:", "/file1.txt,/dir")
-    if st.button("Scan Filesystem"):
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_fs_{ts}.jsonl"
-        with st.spinner("Scanning filesystem..."):
+    if st.checkbox("Bulk mode: shard paths across parallel scans", key="bulk_fs"):
+        fs_paths = bulk_targets_input("Paths", "bulk_fs")
+        shards = st.number_input(
+            "Shards (large directory trees are split into balanced shards):",
+            1, 256, os.cpu_count() or 2, key="bulk_fs_shards",
+        )
+        if st.button("Scan Filesystem Shards"):
+            missing = [p for p in fs_paths if not os.path.exists(p)]
+            if not fs_paths:
+                st.error("Enter or upload at least one path.")
+            elif missing:
+                st.error(f"Paths not found: {', '.join(missing)}")
+            else:
+                ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+                output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_fsbulk_{ts}.jsonl"
+                with st.spinner("Sizing directory trees..."):
+                    shard_lists = shard_paths(fs_paths, shards)
+                scan_id = start_scan(output_path, "\n".join(sorted(fs_paths))) if shard_lists else None
+                submit_bulk_jobs([
+                    (f"Shard {i + 1}/{len(shard_lists)} ({len(members)} paths)",
+                     ["trufflehog", "filesystem"] + members + ["--results=verified,unknown", "--json", "--no-update"])
+                    for i, members in enumerate(shard_lists)
+                ], output_path, scan_id)
+    else:
+        paths = st.text_input("Enter paths comma-separated:", "/file1.txt,/dir")
+        if st.button("Scan Filesystem"):
+            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_fs_{ts}.jsonl"
+            scan_id = start_scan(output_path, paths)
             items = [p.strip() for p in paths.split(",")]
             cmd = ["trufflehog", "filesystem"] + items + ["--results=verified,unknown", "--json", "--no-update"]
-            records = run_trufflehog(cmd, output_path)
+            submit_scan_job(cmd, output_path, scan_id)
 
 elif scan_mode == "Postman Workspace Scan":
     token = st.text_input("Postman API Token:", "")
@@ -352,9 +2331,9 @@ elif scan_mode == "Postman Workspace Scan":
     if st.button("Scan Postman Workspace"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_postman_{ts}.jsonl"
-        with st.spinner("Scanning Postman workspace..."):
-            cmd = ["trufflehog", "postman", "--token", token, "--workspace-id", ws, "--collection-id", coll, "--results=verified,unknown", "--json", "--no-update"]
-            records = run_trufflehog(cmd, output_path)
+        scan_id = start_scan(output_path, f"{ws}/{coll}")
+        cmd = ["trufflehog", "postman", "--token", token, "--workspace-id", ws, "--collection-id", coll, "--results=verified,unknown", "--json", "--no-update"]
+        submit_scan_job(cmd, output_path, scan_id)
 
 elif scan_mode == "Jenkins Scan":
     url = st.text_input("Jenkins URL:", "https://jenkins.example.com")
@@ -363,9 +2342,9 @@ elif scan_mode == "Jenkins Scan":
     if st.button("Scan Jenkins Server"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_jenkins_{ts}.jsonl"
-        with st.spinner("Scanning Jenkins server..."):
-            cmd = ["trufflehog", "jenkins", "--url", url, "--username", user, "--password", pwd, "--results=verified,unknown", "--json", "--no-update"]
-            records = run_trufflehog(cmd, output_path)
+        scan_id = start_scan(output_path, url)
+        cmd = ["trufflehog", "jenkins", "--url", url, "--username", user, "--password", pwd, "--results=verified,unknown", "--json", "--no-update"]
+        submit_scan_job(cmd, output_path, scan_id)
 
 elif scan_mode == "ElasticSearch Scan":
     nodes = st.text_input("Elasticsearch nodes comma-separated:", "127.0.0.1:9200")
@@ -385,7 +2364,8 @@ elif scan_mode == "ElasticSearch Scan":
     if st.button("Scan Elasticsearch"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_es_{ts}.jsonl"
-        records = run_trufflehog(args + ["--results=verified,unknown", "--json", "--no-update"], output_path)
+        scan_id = start_scan(output_path, nodes)
+        submit_scan_job(args + ["--results=verified,unknown", "--json", "--no-update"], output_path, scan_id)
 
 elif scan_mode == "HuggingFace Scan":
     model = st.text_input("Model ID:", "")
@@ -396,35 +2376,199 @@ elif scan_mode == "HuggingFace Scan":
     if st.button("Scan HuggingFace"):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_path = f"/home/kasm-user/Desktop/Downloads/trufflehog_hf_{ts}.jsonl"
+        scan_id = start_scan(output_path, f"{model}|{space}|{dset}|{org}")
         args = ["trufflehog", "huggingface"]
         if model: args += ["--model", model]
         if space: args += ["--space", space]
         if dset: args += ["--dataset", dset]
         if org: args += ["--org", org]
         if incl: args += ["--include-discussions", "--include-prs"]
-        records = run_trufflehog(args + ["--results=verified,unknown", "--json", "--no-update"], output_path)
+        submit_scan_job(args + ["--results=verified,unknown", "--json", "--no-update"], output_path, scan_id)
+
+# Background jobs panel
+jobs = job_scheduler.snapshot()
+jobs_area = None
+if jobs:
+    st.subheader("Scan Jobs")
+    jobs_area = st.empty()
+    render_jobs(jobs_area, jobs)
+    j1, j2, j3 = st.columns([3, 1, 1])
+    jobs_by_id = {job["id"]: job for job in jobs}
+    picked = jobs_by_id[j1.selectbox(
+        "Job:", list(jobs_by_id),
+        format_func=lambda job_id: f"#{job_id} {jobs_by_id[job_id]['label']} ({jobs_by_id[job_id]['state']})"
+    )]
+    if j2.button("Show results"):
+        st.session_state["scan_id"] = picked["scan_id"]
+    if j3.button("Cancel job", disabled=picked["state"] not in JOB_ACTIVE_STATES):
+        job_scheduler.cancel(picked["id"])
+        st.rerun()
 
-# Display results
-if records is not None:
-    if not records:
+# Exports are generated only on request, streamed record by record from the
+# scan's JSONL output into a file next to it, so memory stays bounded no
+# matter how many findings the scan produced.
+EXPORT_FORMATS = {
+    "JSONL (gzip)": (".jsonl.gz", "application/gzip"),
+    "CSV": (".csv", "text/csv"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+EXPORT_COLUMNS = [
+    "SourceName", "SourceURL", "DetectorName", "DecoderName", "Verified", "Raw", "Redacted", "SourceMetadata"
+]
+EXPORT_CHUNK_ROWS = 5000
+
+def iter_jsonl_records(path):
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+def export_row(record):
+    row = {c: str(record.get(c) or "") for c in EXPORT_COLUMNS}
+    row["Verified"] = bool(record.get("Verified"))
+    row["SourceMetadata"] = json.dumps(record.get("SourceMetadata") or {})
+    return row
+
+def export_findings(jsonl_path, export_format):
+    export_path = os.path.splitext(jsonl_path)[0] + EXPORT_FORMATS[export_format][0]
+    part_path = export_path + ".part"
+    if export_format == "JSONL (gzip)":
+        with open(jsonl_path, "rb") as src, gzip.open(part_path, "wb") as dst:
+            for line in src:
+                if line.lstrip().startswith(b"{"):
+                    dst.write(line)
+    elif export_format == "CSV":
+        with open(part_path, "w", newline="") as dst:
+            writer = csv.DictWriter(dst, fieldnames=EXPORT_COLUMNS)
+            writer.writeheader()
+            for record in iter_jsonl_records(jsonl_path):
+                writer.writerow(export_row(record))
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([(c, pa.bool_() if c == "Verified" else pa.string()) for c in EXPORT_COLUMNS])
+        with pq.ParquetWriter(part_path, schema, compression="zstd") as writer:
+            chunk = []
+            for record in iter_jsonl_records(jsonl_path):
+                chunk.append(export_row(record))
+                if len(chunk) >= EXPORT_CHUNK_ROWS:
+                    writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                    chunk = []
+            if chunk:
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+    os.replace(part_path, export_path)
+    return export_path
+
+# Display results from the findings store; the scan id is kept in session
+# state so filtering and paging survive Streamlit reruns. Only the visible
+# page of summary rows is queried and rendered, and a finding's full JSON and
+# occurrence list are loaded only when its row is selected.
+RESULTS_PAGE_SIZES = [25, 50, 100, 250, 500]
+
+scan_id = st.session_state.get("scan_id")
+if scan_id is not None:
+    total = findings_store.count(scan_id)
+    if not total:
         st.success("✅ No secrets found.")
     else:
         st.subheader("Summary of Results")
-        rows = [{
-            'SourceName': r.get('SourceName',''),
-            'DetectorName': r.get('DetectorName',''),
-            'Verified': r.get('Verified',''),
-            'Raw': (r.get('Raw','')[:20] + '...') if r.get('Raw') else ''
-        } for r in records]
-        df = pd.DataFrame(rows)
-        st.dataframe(df, use_container_width=True)
-
-        st.subheader("Detailed Records")
-        for i, r in enumerate(records):
-            with st.expander(f"Record {i+1}: {r.get('DetectorName','Unknown')}"):
-                st.json(r)
-
-        data_json = json.dumps(records, indent=2)
-        st.download_button("Download JSON", data_json, "results.json", "application/json")
-        csv_data = df.to_csv(index=False)
-        st.download_button("Download CSV", csv_data, "summary.csv", "text/csv")
+        by_detector = findings_store.counts_by(scan_id, "detector_name", "DetectorName")
+        by_source = findings_store.counts_by(scan_id, "source_name", "SourceName")
+        previous_scan = findings_store.previous_scan(scan_id)
+        c1, c2, c3, c4, c5 = st.columns(5)
+        c1.metric("Unique findings", total)
+        c2.metric("Occurrences", findings_store.occurrence_count(scan_id))
+        c3.metric("Verified", findings_store.count(scan_id, verified_only=True))
+        c4.metric("Detectors", len(by_detector))
+        if previous_scan is not None:
+            c5.metric(f"New since scan #{previous_scan}", findings_store.count(scan_id, new_only=True))
+        left, right = st.columns(2)
+        left.dataframe(by_detector, use_container_width=True)
+        right.dataframe(by_source, use_container_width=True)
+
+        search = st.text_input("Search findings (detector, source, URL or secret):", "").strip()
+        f1, f2, f3, f4 = st.columns(4)
+        detector = f1.selectbox("Detector:", ["All"] + list(by_detector["DetectorName"]))
+        source = f2.selectbox("Source:", ["All"] + list(by_source["SourceName"]))
+        page_size = f3.selectbox("Rows per page:", RESULTS_PAGE_SIZES, index=2)
+        verified_only = f4.checkbox("Verified only")
+        new_only = f4.checkbox("New only", disabled=previous_scan is None)
+        filters = {
+            "detector": None if detector == "All" else detector,
+            "source": None if source == "All" else source,
+            "verified_only": verified_only,
+            "new_only": new_only,
+            "search": search or None
+        }
+        matching = findings_store.count(scan_id, **filters)
+        page_count = max(1, -(-matching // page_size))
+        view_key = f"{scan_id}|{detector}|{source}|{verified_only}|{new_only}|{search}|{page_size}"
+        page = st.number_input(f"Page (of {page_count}):", 1, page_count, 1, key=f"page|{view_key}")
+        df = findings_store.summary(scan_id, page_size, (page - 1) * page_size, **filters)
+        st.caption(f"Showing {len(df)} of {matching} matching findings")
+        selection = st.dataframe(
+            df, use_container_width=True, hide_index=True,
+            on_select="rerun", selection_mode="single-row", key=f"rows|{view_key}|{page}"
+        )
+
+        st.subheader("Record Details")
+        if selection.selection.rows:
+            finding_id = int(df.index[selection.selection.rows[0]])
+            history = findings_store.history(finding_id)
+            if history:
+                first_scan, first_seen, last_scan, seen_scans = history
+                st.caption(
+                    f"First seen in scan #{first_scan} on {datetime.fromtimestamp(first_seen):%Y-%m-%d %H:%M}; "
+                    f"seen in {seen_scans} scan(s), most recently #{last_scan}."
+                )
+            st.json(findings_store.get(finding_id))
+            st.markdown("**Occurrences**")
+            st.dataframe(findings_store.occurrences(finding_id), use_container_width=True, hide_index=True)
+        else:
+            st.caption("Select a row above to load its full record.")
+
+        st.subheader("Export")
+        output_path = findings_store.scan_output_path(scan_id)
+        e1, e2 = st.columns([3, 1])
+        export_format = e1.selectbox("Export format:", list(EXPORT_FORMATS))
+        if e2.button("Prepare export"):
+            if not output_path or not os.path.exists(output_path):
+                st.error("The scan's JSONL output file is no longer available.")
+            else:
+                with st.spinner(f"Writing {export_format} export..."):
+                    try:
+                        export_path = export_findings(output_path, export_format)
+                    except ImportError:
+                        st.error("Parquet export needs pyarrow installed in the app environment.")
+                        export_path = None
+                if export_path:
+                    st.caption(f"Saved to {export_path}")
+                    with open(export_path, "rb") as export_f:
+                        st.download_button(
+                            f"Download {os.path.basename(export_path)}", export_f,
+                            os.path.basename(export_path), EXPORT_FORMATS[export_format][1]
+                        )
+
+render_metrics()
+
+# While jobs are queued or running, keep the jobs table live and rerun the
+# page whenever a job changes state or the displayed scan gains findings.
+# Any widget interaction interrupts this loop but never the jobs themselves.
+if jobs_area is not None and job_scheduler.active():
+    def job_watch_key():
+        return [
+            (job["id"], job["state"], job["findings"] if job["scan_id"] == scan_id else 0)
+            for job in job_scheduler.snapshot()
+        ]
+
+    watched = job_watch_key()
+    last_rerun = time.monotonic()
+    while job_scheduler.active():
+        time.sleep(1)
+        render_jobs(jobs_area, job_scheduler.snapshot())
+        render_metrics()
+        if job_watch_key() != watched and time.monotonic() - last_rerun >= 3:
+            st.rerun()
+    st.rerun()
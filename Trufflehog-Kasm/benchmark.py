@@ -0,0 +1,442 @@
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+# Offline benchmark for the app's scan pipelines. A local HTTP server generates
+# a synthetic site (configurable page count, link fan-out, duplicate pages,
+# linked JS assets, planted AWS-style keys and injected latency) and stub
+# trufflehog / gobuster executables with controllable cost are put on PATH.
+# Each scenario loads app.py in Streamlit bare mode inside its own subprocess,
+# drives crawl_and_scan, dirbust_and_scan or run_trufflehog directly, and
+# reports wall time, throughput, the app's per-stage latency percentiles and
+# peak RSS as JSON. --baseline compares against an earlier result file.
+#
+#   python benchmark.py                          # all scenarios, JSON to stdout
+#   python benchmark.py crawl --pages 2000 --latency-ms 20 -o bench.json
+#   python benchmark.py --baseline bench.json    # exit 1 on a regression
+#   python benchmark.py serve --port 8000        # just run the synthetic site
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+SCENARIOS = ("crawl", "dirbf", "scan")
+SECRET_RE = re.compile(rb"AKIA[0-9A-Z]{16}")
+FILLER = (
+    b"Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    b"incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud.\n"
+)
+
+def planted_key(seed, kind, i):
+    return "AKIA" + hashlib.sha1(f"{seed}:{kind}:{i}".encode()).hexdigest()[:16].upper()
+
+def chance(seed, kind, i):
+    return random.Random(f"{seed}:{kind}:{i}").random()
+
+# Synthetic site. Every page links to the next one so the whole site is
+# reachable, plus `fanout` pseudo-random pages; duplicates are /mirror/ URLs
+# serving byte-identical copies of a page, and /w<n> paths exist for every
+# `hit_every`-th brute-force word.
+class SyntheticSite:
+    def __init__(self, config):
+        self.config = config
+        self.seed = config["seed"]
+
+    def page_has_secret(self, i):
+        return chance(self.seed, "secret", i) < self.config["secret_ratio"]
+
+    def page_has_mirror(self, i):
+        return chance(self.seed, "mirror", i) < self.config["duplicate_ratio"]
+
+    def word_hit(self, n):
+        return n % self.config["hit_every"] == 0
+
+    def padding(self):
+        return FILLER * max(self.config["page_kb"] * 1024 // len(FILLER), 1)
+
+    def index(self):
+        links = "".join(f'<a href="/p/{i}.html">page {i}</a>\n' for i in range(min(self.config["fanout"], self.config["pages"])))
+        return f"<html><body><h1>Synthetic site</h1>\n{links}</body></html>".encode()
+
+    def page(self, i):
+        pages, rng = self.config["pages"], random.Random(f"{self.seed}:links:{i}")
+        targets = {(i + 1) % pages} | {rng.randrange(pages) for _ in range(self.config["fanout"])}
+        links = "".join(f'<a href="/p/{t}.html">page {t}</a>\n' for t in sorted(targets))
+        if self.page_has_mirror(i):
+            links += f'<a href="/mirror/{i}.html">mirror</a>\n'
+        script = f'<script src="/static/app{i % self.config["assets"]}.js"></script>\n' if self.config["assets"] else ""
+        secret = f"<!-- aws_access_key_id = {planted_key(self.seed, 'page', i)} -->\n" if self.page_has_secret(i) else ""
+        head = f"<html><head><title>Page {i}</title>\n{script}</head><body>\n{secret}{links}<p>".encode()
+        return head + self.padding() + b"</p></body></html>"
+
+    def asset(self, k):
+        body = f"var config = {{build: {k}, key: \"{planted_key(self.seed, 'asset', k)}\"}};\n"
+        return body.encode() + self.padding()
+
+    def word_page(self, n):
+        secret = f"aws_access_key_id={planted_key(self.seed, 'word', n)}\n" if chance(self.seed, "word", n) < self.config["secret_ratio"] else ""
+        return f"<html><body>/w{n}\n{secret}</body></html>".encode()
+
+    def planted(self, scenario):
+        if scenario == "dirbf":
+            return {planted_key(self.seed, "word", n) for n in range(self.config["words"])
+                    if self.word_hit(n) and chance(self.seed, "word", n) < self.config["secret_ratio"]}
+        keys = {planted_key(self.seed, "page", i) for i in range(self.config["pages"]) if self.page_has_secret(i)}
+        if scenario == "crawl":
+            keys |= {planted_key(self.seed, "asset", k) for k in range(self.config["assets"])}
+        return keys
+
+    def route(self, path):
+        if path in ("/", "/index.html"):
+            return "text/html", self.index()
+        match = re.fullmatch(r"/(p|mirror)/(\d+)\.html", path)
+        if match and int(match.group(2)) < self.config["pages"]:
+            return "text/html", self.page(int(match.group(2)))
+        match = re.fullmatch(r"/static/app(\d+)\.js", path)
+        if match and int(match.group(1)) < self.config["assets"]:
+            return "application/javascript", self.asset(int(match.group(1)))
+        match = re.fullmatch(r"/w(\d+)", path)
+        if match and int(match.group(1)) < self.config["words"] and self.word_hit(int(match.group(1))):
+            return "text/html", self.word_page(int(match.group(1)))
+        return None, None
+
+def start_site(config, port=0):
+    site = SyntheticSite(config)
+
+    class SiteHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            latency = config["latency_ms"] + random.uniform(0, config["jitter_ms"])
+            if latency:
+                time.sleep(latency / 1000)
+            content_type, body = site.route(urlparse(self.path).path)
+            if body is None:
+                self.send_response(404)
+                body, content_type = b"not found", "text/plain"
+            else:
+                self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), SiteHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return site, server
+
+# Stub executables. The wrappers on PATH re-enter this script, which then plays
+# trufflehog (filesystem mode: reports every AKIA key in the given files) or
+# gobuster (dir mode: reports the /w<n> words the synthetic site serves).
+# Their cost comes from BENCH_* environment variables set by the runner.
+def stub_trufflehog(argv):
+    time.sleep(float(os.environ.get("BENCH_SCAN_START_MS", 0)) / 1000)
+    per_file = float(os.environ.get("BENCH_SCAN_MS_PER_FILE", 0)) / 1000
+    per_mb = float(os.environ.get("BENCH_SCAN_MS_PER_MB", 0)) / 1000
+    print("🐷🔑🐷  TruffleHog. Unearth your secrets. 🐷🔑🐷 (benchmark stub)", file=sys.stderr)
+    paths = [arg for arg in argv if not arg.startswith("-")][1:]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [os.path.join(root, name) for root, _, names in os.walk(path) for name in sorted(names)]
+        else:
+            files.append(path)
+    for path in files:
+        with open(path, "rb") as f:
+            data = f.read()
+        time.sleep(per_file + per_mb * len(data) / 1e6)
+        for match in SECRET_RE.finditer(data):
+            raw = match.group().decode()
+            print(json.dumps({
+                "SourceMetadata": {"Data": {"Filesystem": {"file": path, "line": data.count(b"\n", 0, match.start()) + 1}}},
+                "SourceID": 1, "SourceType": 15, "SourceName": "trufflehog - filesystem",
+                "DetectorType": 2, "DetectorName": "AWS", "DecoderName": "PLAIN",
+                "Verified": False, "Raw": raw, "RawV2": "", "Redacted": raw[:8] + "*" * 12, "ExtraData": None
+            }), flush=True)
+
+def stub_gobuster(argv):
+    base_url = argv[argv.index("-u") + 1].rstrip("/")
+    per_word = float(os.environ.get("BENCH_GOBUSTER_US_PER_WORD", 0)) / 1e6
+    hit_every = int(os.environ.get("BENCH_HIT_EVERY", 1))
+    words = int(os.environ.get("BENCH_WORDS", 0))
+    with open(argv[argv.index("-w") + 1]) as f:
+        for line in f:
+            word = line.strip()
+            time.sleep(per_word)
+            match = re.fullmatch(r"w(\d+)", word)
+            if match and int(match.group(1)) < words and int(match.group(1)) % hit_every == 0:
+                print(f"{base_url}/{word}              (Status: 200) [Size: 64]", flush=True)
+
+def install_stubs(bin_dir):
+    for name in ("trufflehog", "gobuster"):
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.abspath(__file__)}" _stub-{name} "$@"\n')
+        os.chmod(path, 0o755)
+
+# Scenario runner: executed in a fresh subprocess per run so caches, the
+# findings store and peak RSS are isolated. Prints one JSON object; items are
+# pages fetched for crawl/dirbf and corpus files for scan.
+def load_app():
+    import importlib.util
+    import logging
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+    spec = importlib.util.spec_from_file_location("trufflehog_webui", APP_PATH)
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    return app
+
+def count_secrets(path):
+    found = set()
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    found.add(json.loads(line).get("Raw"))
+                except ValueError:
+                    pass
+    found.discard(None)
+    return found
+
+def run_scenario(spec):
+    app = load_app()
+    work_dir = spec["work_dir"]
+    output_path = os.path.join(work_dir, f"{spec['scenario']}.jsonl")
+    scan_id = app.start_scan(output_path, target=spec["target"])
+    app.metrics.totals.reset()
+    started = time.perf_counter()
+    if spec["scenario"] == "crawl":
+        app.crawl_and_scan(
+            spec["target"], spec["max_pages"], "Exact Host", output_path, scan_id=scan_id,
+            workers=spec["workers"], use_cache=False
+        )
+    elif spec["scenario"] == "dirbf":
+        app.dirbust_and_scan(
+            spec["target"], spec["wordlist"], spec["threads"], output_path, scan_id,
+            os.path.join(work_dir, "gobuster.log"), use_cache=False
+        )
+    else:
+        cmd = ["trufflehog", "filesystem", spec["corpus"], "--results=verified,unknown", "--json", "--no-update"]
+        app.run_trufflehog(cmd, output_path, scan_id=scan_id)
+        app.findings_store.commit()
+    wall = time.perf_counter() - started
+    summary = app.metrics.totals.summary()
+    found = count_secrets(output_path)
+    counters = summary["counters"]
+    if spec["scenario"] == "scan":
+        names = os.listdir(spec["corpus"])
+        items, nbytes = len(names), sum(os.path.getsize(os.path.join(spec["corpus"], name)) for name in names)
+    else:
+        items = counters.get("pages_fetched", {}).get("total", 0)
+        nbytes = counters.get("bytes_fetched", {}).get("total", 0)
+    return {
+        "wall_s": round(wall, 3),
+        "items": items,
+        "items_per_s": round(items / wall, 2),
+        "input_mb": round(nbytes / 1e6, 3),
+        "mb_per_s": round(nbytes / 1e6 / wall, 3),
+        "findings": app.findings_store.count(scan_id),
+        "occurrences": app.findings_store.occurrence_count(scan_id),
+        "secrets_found": len(found),
+        "secrets_missed": len(set(spec["planted"]) - found),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": summary["stages"],
+        "counters": counters
+    }
+
+def write_corpus(site, corpus_dir):
+    os.makedirs(corpus_dir, exist_ok=True)
+    for i in range(site.config["pages"]):
+        with open(os.path.join(corpus_dir, f"page{i:06d}.html"), "wb") as f:
+            f.write(site.page(i))
+
+def prepare(scenario, site, server, config, work_dir):
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    spec = {"scenario": scenario, "work_dir": work_dir, "planted": sorted(site.planted(scenario))}
+    if scenario == "crawl":
+        mirrors = sum(site.page_has_mirror(i) for i in range(config["pages"]))
+        spec.update(target=base_url + "/", workers=config["workers"],
+                    max_pages=config["max_pages"] or config["pages"] + mirrors + 1)
+    elif scenario == "dirbf":
+        spec.update(target=base_url, threads=config["threads"], wordlist=os.path.join(work_dir, "words.txt"))
+        with open(spec["wordlist"], "w") as f:
+            f.writelines(f"w{n}\n" for n in range(config["words"]))
+    else:
+        spec.update(target=os.path.join(work_dir, "corpus"), corpus=os.path.join(work_dir, "corpus"))
+        write_corpus(site, spec["corpus"])
+    return spec
+
+def run_once(scenario, site, server, config, env):
+    work_dir = tempfile.mkdtemp(prefix=f"trufflehog_bench_{scenario}_")
+    try:
+        spec = prepare(scenario, site, server, config, work_dir)
+        env = dict(env, TRUFFLEHOG_STATE_DIR=os.path.join(work_dir, "state"))
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "_scenario", json.dumps(spec)],
+            env=env, capture_output=True, text=True, timeout=config["run_timeout"]
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"{scenario} scenario failed:\n{proc.stderr[-4000:]}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def aggregate(runs):
+    result = {"runs": len(runs)}
+    for key in ("wall_s", "items_per_s", "mb_per_s", "peak_rss_mb"):
+        values = [run[key] for run in runs]
+        result[key] = round(statistics.median(values), 3)
+        result[key + "_min"], result[key + "_max"] = min(values), max(values)
+    for key in ("items", "input_mb", "findings", "occurrences", "secrets_found", "secrets_missed"):
+        result[key] = runs[-1][key]
+    result["stages"] = runs[-1]["stages"]
+    result["counters"] = runs[-1]["counters"]
+    return result
+
+# Regression check: a scenario regresses when its median wall time grew by more
+# than the tolerance, or when it now misses planted secrets it used to find.
+def compare(results, baseline, tolerance):
+    regressions = []
+    for scenario, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous:
+            continue
+        ratio = current["wall_s"] / previous["wall_s"] if previous["wall_s"] else 1.0
+        current["wall_vs_baseline"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(f"{scenario}: wall time {previous['wall_s']}s -> {current['wall_s']}s ({ratio - 1:+.0%})")
+        if current["secrets_missed"] > previous.get("secrets_missed", 0):
+            regressions.append(f"{scenario}: missed {current['secrets_missed']} planted secrets "
+                               f"(baseline {previous.get('secrets_missed', 0)})")
+    return regressions
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(APP_PATH),
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Offline benchmark for the Trufflehog WebUI scan pipelines.")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"scenarios to run: {', '.join(SCENARIOS)} (default: all), or 'serve'")
+    site = parser.add_argument_group("synthetic site")
+    site.add_argument("--pages", type=int, default=500)
+    site.add_argument("--fanout", type=int, default=8, help="extra links per page")
+    site.add_argument("--duplicate-ratio", type=float, default=0.1, help="share of pages with a byte-identical mirror URL")
+    site.add_argument("--secret-ratio", type=float, default=0.05, help="share of pages with a planted key")
+    site.add_argument("--assets", type=int, default=5, help="distinct linked JS assets")
+    site.add_argument("--page-kb", type=int, default=8)
+    site.add_argument("--latency-ms", type=float, default=0.0)
+    site.add_argument("--jitter-ms", type=float, default=0.0)
+    site.add_argument("--words", type=int, default=10000, help="brute-force wordlist size")
+    site.add_argument("--hit-every", type=int, default=50, help="every n-th word exists on the site")
+    site.add_argument("--seed", type=int, default=1)
+    site.add_argument("--port", type=int, default=0, help="port for 'serve' (default: any free port)")
+    stubs = parser.add_argument_group("stub tools")
+    stubs.add_argument("--scan-start-ms", type=float, default=200.0, help="trufflehog start-up cost per run")
+    stubs.add_argument("--scan-ms-per-file", type=float, default=0.5)
+    stubs.add_argument("--scan-ms-per-mb", type=float, default=20.0)
+    stubs.add_argument("--gobuster-us-per-word", type=float, default=50.0)
+    run = parser.add_argument_group("runs")
+    run.add_argument("--workers", type=int, default=16, help="crawl fetch workers")
+    run.add_argument("--threads", type=int, default=10, help="gobuster threads")
+    run.add_argument("--max-pages", type=int, default=0, help="crawl page limit (default: whole site)")
+    run.add_argument("--repeat", type=int, default=1)
+    run.add_argument("--run-timeout", type=int, default=1800, help="seconds before a run is abandoned")
+    run.add_argument("-o", "--output", help="write results JSON here instead of stdout")
+    run.add_argument("--baseline", help="results JSON to compare against; exit 1 on regression")
+    run.add_argument("--tolerance", type=float, default=0.10, help="allowed wall-time growth vs baseline")
+    args = parser.parse_args(argv)
+    for scenario in args.scenarios:
+        if scenario not in SCENARIOS + ("serve",):
+            parser.error(f"unknown scenario {scenario!r} (choose from {', '.join(SCENARIOS)}, serve)")
+    return args
+
+def main(argv):
+    if argv and argv[0] in ("_stub-trufflehog", "_stub-gobuster"):
+        (stub_trufflehog if argv[0] == "_stub-trufflehog" else stub_gobuster)(argv[1:])
+        return 0
+    if argv and argv[0] == "_scenario":
+        print(json.dumps(run_scenario(json.loads(argv[1]))))
+        return 0
+
+    args = parse_args(argv)
+    config = {key: value for key, value in vars(args).items()
+              if key not in ("scenarios", "output", "baseline", "tolerance", "port", "repeat")}
+    if "serve" in args.scenarios:
+        _, server = start_site(config, args.port)
+        print(f"Synthetic site on http://127.0.0.1:{server.server_address[1]}/ (Ctrl+C to stop)", flush=True)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            return 0
+
+    bin_dir = tempfile.mkdtemp(prefix="trufflehog_bench_bin_")
+    install_stubs(bin_dir)
+    env = dict(
+        os.environ, PATH=bin_dir + os.pathsep + os.environ.get("PATH", ""),
+        BENCH_SCAN_START_MS=str(args.scan_start_ms), BENCH_SCAN_MS_PER_FILE=str(args.scan_ms_per_file),
+        BENCH_SCAN_MS_PER_MB=str(args.scan_ms_per_mb), BENCH_GOBUSTER_US_PER_WORD=str(args.gobuster_us_per_word),
+        BENCH_HIT_EVERY=str(args.hit_every), BENCH_WORDS=str(args.words),
+        TRUFFLEHOG_METRICS_PORT=""
+    )
+    site, server = start_site(config)
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": config,
+        "scenarios": {}
+    }
+    try:
+        for scenario in args.scenarios or SCENARIOS:
+            runs = [run_once(scenario, site, server, config, env) for _ in range(args.repeat)]
+            results["scenarios"][scenario] = dict(aggregate(runs), secrets_planted=len(site.planted(scenario)))
+            print(f"{scenario}: {results['scenarios'][scenario]['wall_s']}s", file=sys.stderr, flush=True)
+    finally:
+        server.shutdown()
+        shutil.rmtree(bin_dir, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("warning: baseline was recorded with a different configuration", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        results["regressions"] = regressions
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
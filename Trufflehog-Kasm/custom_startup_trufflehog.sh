@@ -4,22 +4,45 @@
 # Wait for the Kasm desktop environment
 /usr/bin/desktop_ready
 
+STATE_DIR="${TRUFFLEHOG_STATE_DIR:-$HOME/.cache/trufflehog-webui}"
+READY_TIMEOUT="${STREAMLIT_READY_TIMEOUT:-60}"
+mkdir -p "$STATE_DIR"
+
 echo "[*] Launching Streamlit app..."
 cd /app
 source /app/venv/bin/activate
-# Start via Streamlit CLI so proper server context is created
-streamlit run app.py --server.address 0.0.0.0 --server.port 5000 --server.headless true &
+started=$(date +%s.%N)
+# Start via Streamlit CLI so proper server context is created; the file
+# watcher and usage-stats call only slow startup down inside the image
+streamlit run app.py --server.address 0.0.0.0 --server.port 5000 --server.headless true \
+    --server.fileWatcherType none --browser.gatherUsageStats false &
+server_pid=$!
+
+elapsed() {
+    awk -v start="$started" -v now="$(date +%s.%N)" 'BEGIN { printf "%.2f", now - start }'
+}
 
-# Wait for Streamlit to respond
-echo "[*] Waiting for Streamlit to become responsive..."
-for i in {1..20}; do
-    if curl -s http://localhost:5000 > /dev/null; then
-        echo "[+] Streamlit is ready"
+# Poll Streamlit's health endpoint until it reports ok, the server exits or
+# READY_TIMEOUT seconds pass, then record how long startup took
+echo "[*] Waiting for Streamlit to become ready..."
+ready=""
+while kill -0 "$server_pid" 2>/dev/null; do
+    if [ "$(curl -sf --max-time 1 http://localhost:5000/_stcore/health)" = "ok" ]; then
+        ready=$(elapsed)
+        break
+    fi
+    if awk -v t="$(elapsed)" -v limit="$READY_TIMEOUT" 'BEGIN { exit !(t > limit) }'; then
         break
     fi
-    echo "[-] Still waiting... ($i)"
-    sleep 1
+    sleep 0.1
 done
+if [ -n "$ready" ]; then
+    echo "[+] Streamlit is ready after ${ready}s"
+    printf '{"time": "%s", "event": "server_ready", "seconds": %s}\n' "$(date +%Y-%m-%dT%H:%M:%S)" "$ready" \
+        >> "$STATE_DIR/startup.jsonl"
+else
+    echo "[-] Streamlit did not report ready within ${READY_TIMEOUT}s; opening anyway"
+fi
 
 echo "[*] Opening in Chrome..."
 google-chrome --no-sandbox --disable-dev-shm-usage --start-maximized http://localhost:5000 &